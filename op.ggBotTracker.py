@@ -1,30 +1,1903 @@
+import sys
+import argparse
 import time
 import json
 import os
-from datetime import datetime
-from discord_webhook import DiscordWebhook, DiscordEmbed
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+import re
+import heapq
+import queue
+import random
+import threading
+import hashlib
+import sqlite3
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from html.parser import HTMLParser
+from urllib.parse import urlparse
+
+# Backends pesados: se importan la primera vez que se usan, así validate-config o stats arrancan sin ellos
+requests = HTTPAdapter = DiscordEmbed = None
+webdriver = By = WebDriverWait = EC = Options = None
+
+
+class TimeoutException(Exception):
+    """Sustituto hasta importar Selenium: sin navegador nada lanza el TimeoutException real"""
+
+
+def load_requests():
+    """Importa requests (fetcher HTTP y webhook de Discord)"""
+    global requests, HTTPAdapter
+    import requests
+    from requests.adapters import HTTPAdapter
+
+
+def load_discord():
+    """Importa discord_webhook (solo hace falta para construir embeds)"""
+    global DiscordEmbed
+    from discord_webhook import DiscordEmbed
+
+
+def load_selenium():
+    """Importa Selenium (solo cuando de verdad se va a usar un navegador)"""
+    global webdriver, By, WebDriverWait, EC, Options, TimeoutException
+    from selenium import webdriver
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.chrome.options import Options
+    from selenium.common.exceptions import TimeoutException
+
+# Clases que identifican cada fila de partida en el historial de OP.GG
+MATCH_ROW_CLASSES = frozenset({'box-border', 'flex', 'w-full', 'border-l-[6px]'})
+MATCH_ROW_XPATH = ("//div[contains(@class, 'box-border') and contains(@class, 'flex') "
+                   "and contains(@class, 'w-full') and contains(@class, 'border-l-[6px]')]")
+# Fecha del tooltip de la partida (p. ej. "16/10/2025, 20:10"), sin fijar el año
+TOOLTIP_DATE_RE = re.compile(r'\d{1,2}/\d{1,2}/\d{4}')
+TOOLTIP_DATE_FORMATS = ('%d/%m/%Y, %H:%M', '%d/%m/%Y %H:%M', '%d/%m/%Y, %H:%M:%S', '%d/%m/%Y')
+DURATION_RE = re.compile(r'(?:(\d+)h\s*)?(\d+)m\s*(\d+)s')
+# Fechas absolutas de las primeras partidas (HTML o JSON embebido): cambian al entrar una partida nueva,
+# no con el paso del tiempo como los textos relativos ("hace 2 horas")
+FINGERPRINT_RE = re.compile(r'data-tooltip-content="(\d{1,2}/\d{1,2}/\d{4}[^"]*)"|"created_at":\s*"([^"]+)"')
+KDA_CONTAINER_CLASSES = frozenset({'flex', 'items-center', 'gap-1'})
+VOID_TAGS = frozenset({'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+                       'link', 'meta', 'param', 'source', 'track', 'wbr'})
+
+
+class Metrics:
+    """Registro de métricas estilo Prometheus: contadores, gauges e histogramas con etiquetas"""
+    DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = defaultdict(float)
+        self.gauges = {}
+        self.histograms = {}
+        self.buckets = {}
+        self.help = {}
+        self.json_log_file = None
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def describe(self, name, text, buckets=None):
+        """Texto de ayuda (y buckets, para histogramas) de una métrica"""
+        self.help[name] = text
+        if buckets:
+            self.buckets[name] = tuple(buckets)
+
+    def inc(self, name, value=1, **labels):
+        with self._lock:
+            self.counters[self._key(name, labels)] += value
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self.gauges[self._key(name, labels)] = value
+
+    def discard(self, name, **labels):
+        """Elimina una serie de gauge que ya no tiene sentido exportar"""
+        with self._lock:
+            self.gauges.pop(self._key(name, labels), None)
+
+    def observe(self, name, value, **labels):
+        buckets = self.buckets.get(name, self.DEFAULT_BUCKETS)
+        key = self._key(name, labels)
+        with self._lock:
+            counts, total, observed = self.histograms.get(key, ([0] * len(buckets), 0.0, 0))
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self.histograms[key] = (counts, total + value, observed + 1)
+
+    @contextmanager
+    def time(self, name, **labels):
+        """Mide la duración del bloque y la registra en el histograma `name`"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def log(self, event, **fields):
+        """Escribe un evento estructurado como una línea JSON (si hay archivo configurado)"""
+        if not self.json_log_file:
+            return
+        line = json.dumps({'ts': datetime.now().isoformat(), 'event': event, **fields}, default=str)
+        with self._lock:
+            with open(self.json_log_file, 'a') as f:
+                f.write(line + '\n')
+
+    @staticmethod
+    def _labels(labels, extra=None):
+        items = list(labels) + ([extra] if extra else [])
+        if not items:
+            return ''
+        return '{' + ','.join(f'{k}="{str(v)}"' for k, v in items) + '}'
+
+    def render(self):
+        """Exporta todas las métricas en formato de texto de Prometheus"""
+        lines = []
+        with self._lock:
+            families = defaultdict(list)
+            for (name, labels), value in self.counters.items():
+                families[(name, 'counter')].append((labels, value))
+            for (name, labels), value in self.gauges.items():
+                families[(name, 'gauge')].append((labels, value))
+            for (name, labels), value in self.histograms.items():
+                families[(name, 'histogram')].append((labels, value))
+            
+            for (name, kind), series in sorted(families.items()):
+                if name in self.help:
+                    lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in series:
+                    if kind != 'histogram':
+                        lines.append(f"{name}{self._labels(labels)} {value}")
+                        continue
+                    counts, total, observed = value
+                    buckets = self.buckets.get(name, self.DEFAULT_BUCKETS)
+                    for bound, count in zip(buckets, counts):
+                        lines.append(f"{name}_bucket{self._labels(labels, ('le', bound))} {count}")
+                    lines.append(f"{name}_bucket{self._labels(labels, ('le', '+Inf'))} {observed}")
+                    lines.append(f"{name}_sum{self._labels(labels)} {total}")
+                    lines.append(f"{name}_count{self._labels(labels)} {observed}")
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port, host='127.0.0.1'):
+        """Expone /metrics por HTTP en un hilo de fondo"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+        print(f"📈 Métricas disponibles en http://{host}:{server.server_port}/metrics")
+        return server
+
+
+metrics = Metrics()
+metrics.describe('opgg_stage_seconds', 'Duración de cada etapa del scraping y del envío')
+metrics.describe('opgg_poll_seconds', 'Duración total de cada comprobación de perfil')
+metrics.describe('opgg_polls_total', 'Comprobaciones de perfil por resultado')
+metrics.describe('opgg_parse_fallbacks_total', 'Campos que el parser no encontró y sustituyó por un valor por defecto')
+metrics.describe('opgg_scrape_failures_total', 'Fallos de carga del perfil por fetcher')
+metrics.describe('opgg_detection_lag_seconds', 'Tiempo entre el final de la partida (inicio + duración) y su detección',
+                 buckets=(60, 300, 600, 1200, 1800, 3600, 7200, 21600, 86400))
+metrics.describe('opgg_driver_rss_bytes', 'Memoria residente de chromedriver y sus procesos de Chrome')
+metrics.describe('opgg_driver_restarts_total', 'Reinicios de Chrome por motivo (reciclado preventivo o caída)')
+metrics.describe('discord_retries_total', 'Reintentos de envío a Discord por motivo')
+metrics.describe('discord_delivered_total', 'Embeds entregados a Discord')
+metrics.describe('discord_queue_depth', 'Embeds pendientes de envío a Discord')
+metrics.describe('opgg_scrapes_in_flight', 'Comprobaciones de perfil en curso o en cola del executor')
+metrics.describe('opgg_scrape_timeouts_total', 'Comprobaciones que superaron su timeout')
+metrics.describe('opgg_scrape_cancelled_total', 'Comprobaciones canceladas antes de cargar el perfil, por motivo')
+metrics.describe('opgg_profiles_per_minute', 'Perfiles comprobados por minuto (ventana móvil)')
+metrics.describe('opgg_profile_renewals_total', 'Intentos de pulsar "Update" en el perfil por resultado')
+
+
+def process_tree_rss(pid):
+    """RSS en bytes de un proceso y todos sus descendientes (vía /proc; None si no está disponible)"""
+    try:
+        children = defaultdict(list)
+        for entry in os.listdir('/proc'):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f'/proc/{entry}/stat', 'r') as f:
+                    stat = f.read()
+            except OSError:
+                continue
+            # El nombre del proceso va entre paréntesis y puede contener espacios
+            ppid = int(stat.rsplit(')', 1)[1].split()[1])
+            children[ppid].append(int(entry))
+        
+        page_size = os.sysconf('SC_PAGE_SIZE')
+        total = 0
+        pending = [pid]
+        while pending:
+            current = pending.pop()
+            try:
+                with open(f'/proc/{current}/statm', 'r') as f:
+                    total += int(f.read().split()[1]) * page_size
+            except OSError:
+                pass
+            pending.extend(children.get(current, []))
+        return total
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+
+class _Node:
+    """Nodo mínimo del árbol HTML de una fila de partida"""
+    __slots__ = ('tag', 'attrs', 'classes', 'children', 'parent', 'texts')
+
+    def __init__(self, tag, attrs, parent=None):
+        self.tag = tag
+        self.attrs = attrs
+        self.classes = frozenset((attrs.get('class') or '').split())
+        self.children = []
+        self.parent = parent
+        self.texts = []
+
+    def iter(self):
+        """Recorre los descendientes en orden de documento"""
+        stack = list(reversed(self.children))
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+    def first_text(self):
+        """Primer nodo de texto directo (equivale a text() en XPath)"""
+        return self.texts[0] if self.texts else ''
+
+    def text_content(self):
+        """Texto completo del nodo y sus descendientes"""
+        parts = list(self.texts)
+        for node in self.iter():
+            parts.extend(node.texts)
+        return ''.join(parts).strip()
+
+
+class _MatchRowCollector(HTMLParser):
+    """Construye árboles solo para las filas de partida, ignorando el resto de la página"""
+
+    def __init__(self, limit=None, skip=0):
+        super().__init__(convert_charrefs=True)
+        self.limit = limit
+        self.skip = skip
+        self.row_count = 0
+        self.rows = []
+        self._current = None
+        self._skip_depth = 0
+
+    @property
+    def done(self):
+        """True cuando ya se han cerrado `limit` filas: el resto del documento sobra"""
+        return self.limit is not None and self.row_count >= self.limit and self._current is None
+
+    def handle_starttag(self, tag, attrs):
+        if self._skip_depth:
+            if tag not in VOID_TAGS:
+                self._skip_depth += 1
+            return
+        if self._current is None:
+            if tag != 'div' or (self.limit is not None and self.row_count >= self.limit):
+                return
+            attrs = dict(attrs)
+            if not MATCH_ROW_CLASSES.issubset((attrs.get('class') or '').split()):
+                return
+            self.row_count += 1
+            if self.row_count <= self.skip:
+                # Fila ya procesada: solo se sigue su anidamiento para saber dónde termina
+                self._skip_depth = 1
+                return
+            self._current = _Node(tag, attrs)
+            self.rows.append(self._current)
+            return
+        node = _Node(tag, dict(attrs), self._current)
+        self._current.children.append(node)
+        if tag not in VOID_TAGS:
+            self._current = node
+
+    def handle_startendtag(self, tag, attrs):
+        if self._current is not None:
+            self._current.children.append(_Node(tag, dict(attrs), self._current))
+
+    def handle_endtag(self, tag):
+        if self._skip_depth:
+            if tag not in VOID_TAGS:
+                self._skip_depth -= 1
+            return
+        if self._current is None or tag in VOID_TAGS:
+            return
+        node = self._current
+        while node is not None and node.tag != tag:
+            node = node.parent
+        if node is not None:
+            self._current = node.parent
+
+    def handle_data(self, data):
+        if self._current is not None:
+            self._current.texts.append(data)
+
+
+def parse_match_time(timestamp):
+    """Convierte el texto del tooltip de OP.GG (hora local) en datetime con zona horaria (None si no se reconoce)"""
+    if not timestamp:
+        return None
+    for date_format in TOOLTIP_DATE_FORMATS:
+        try:
+            return datetime.strptime(timestamp.strip(), date_format).astimezone()
+        except ValueError:
+            continue
+    return None
+
+
+def page_fingerprint(html, rows=3):
+    """
+    Huella barata de la cabeza del historial, calculada sin parsear el HTML.
+
+    Args:
+        html: HTML completo de la página del perfil
+        rows: Número de partidas más recientes que entran en la huella
+
+    Returns:
+        Hash corto, o None si no se reconoce ninguna fecha (entonces siempre se parsea)
+    """
+    start = max(html.find('border-l-[6px]'), 0)
+    dates = []
+    for found in FINGERPRINT_RE.finditer(html, start):
+        dates.append(found.group(1) or found.group(2))
+        if len(dates) == rows:
+            break
+    if not dates:
+        return None
+    key = f"{html.count('border-l-[6px]', start)}|" + '|'.join(dates)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+
+def parse_duration(text):
+    """Convierte "23m 12s" (o "1h 02m 03s") en segundos (None si no se reconoce)"""
+    found = DURATION_RE.search(text or '')
+    if not found:
+        return None
+    hours, minutes, seconds = (int(value or 0) for value in found.groups())
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def match_identity(played_at, timestamp, result, champion, kda):
+    """
+    Identidad estable de una partida, igual para todos los fetchers (HTML, JSON embebido, Selenium).
+
+    Solo usa datos que no cambian entre cargas ni entre backends: el minuto de inicio (en UTC),
+    el resultado y el KDA. La duración y los textos relativos quedan fuera; el campeón solo entra
+    si no hay fecha, porque su nombre no se escribe igual en el HTML y en el JSON.
+    """
+    if played_at is not None:
+        when = played_at.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M')
+        key = f"{when}|{result}|{kda}"
+    else:
+        key = f"{timestamp}|{result}|{kda}|{champion}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+
+class Match:
+    """Partida tipada, parseada una sola vez al scrapear"""
+    __slots__ = ('match_id', 'result', 'champion', 'kills', 'deaths', 'assists',
+                 'played_at', 'duration', 'queue', 'timestamp', 'duration_text')
+
+    def __init__(self, result=None, champion=None, kills=None, deaths=None, assists=None,
+                 timestamp=None, duration_text=None, queue=None, played_at=None):
+        """
+        Args:
+            result: 'Defeat', 'Victory' o None si no se reconoce
+            champion: Nombre del campeón ('Unknown' si falta)
+            kills, deaths, assists: KDA (se guardan como enteros, None si falta)
+            timestamp: Texto original de la fecha, tal y como lo muestra OP.GG
+            duration_text: Texto original de la duración ("23m 12s")
+            queue: Tipo de cola ('Unknown' si falta)
+            played_at: datetime con zona horaria (se deduce de timestamp si no se indica)
+        """
+        self.result = result
+        self.champion = champion or 'Unknown'
+        self.kills, self.deaths, self.assists = _to_int(kills), _to_int(deaths), _to_int(assists)
+        if None in (self.kills, self.deaths, self.assists):
+            self.kills = self.deaths = self.assists = None
+        self.timestamp = timestamp
+        self.duration_text = duration_text
+        self.duration = parse_duration(duration_text)
+        self.queue = queue or 'Unknown'
+        self.played_at = played_at or parse_match_time(timestamp)
+        # Se calcula ahora: los ajustes de visualización posteriores no cambian la identidad
+        self.match_id = match_identity(self.played_at, self.timestamp, self.result, self.champion, self.kda)
+
+    @property
+    def is_defeat(self):
+        return self.result == 'Defeat'
+
+    @property
+    def kda(self):
+        """KDA como texto ("5/7/2"), o '?' si no se encontró"""
+        if self.kills is None:
+            return '?'
+        return f"{self.kills}/{self.deaths}/{self.assists}"
+
+    @property
+    def duration_label(self):
+        """Duración como la muestra OP.GG, o '?' si no se encontró"""
+        return self.duration_text or '?'
+
+    def to_dict(self):
+        """Representación serializable a JSON (logs)"""
+        return {
+            'match_id': self.match_id,
+            'result': self.result,
+            'champion': self.champion,
+            'kills': self.kills,
+            'deaths': self.deaths,
+            'assists': self.assists,
+            'played_at': self.played_at.isoformat() if self.played_at else None,
+            'duration': self.duration,
+            'queue': self.queue
+        }
+
+    def __repr__(self):
+        return f"Match({self.result}, {self.champion}, {self.kda}, {self.timestamp})"
+
+
+class MatchPageParser:
+    """Extrae todas las partidas de un page_source de OP.GG en una sola pasada"""
+    CHUNK_SIZE = 16384
+
+    def parse(self, html, limit=None, skip=0):
+        """
+        Args:
+            html: HTML completo de la página del perfil
+            limit: Número máximo de partidas a extraer (None = todas)
+            skip: Filas iniciales a saltar sin construirlas (ya procesadas en otra pasada)
+
+        Returns:
+            Lista de Match, la más reciente primero. Los campos que no se encuentran
+            quedan como None (o 'Unknown' en campeón y cola).
+        """
+        collector = _MatchRowCollector(limit, skip)
+        # Por trozos, para dejar de tokenizar en cuanto se completan las filas pedidas
+        for start in range(0, len(html), self.CHUNK_SIZE):
+            collector.feed(html[start:start + self.CHUNK_SIZE])
+            if collector.done:
+                break
+        else:
+            collector.close()
+        return [self._parse_row(row) for row in collector.rows]
+
+    def _parse_row(self, row):
+        result = None
+        queue_type = None
+        timestamp = None
+        champion = None
+        duration = None
+        kda = []
+        kda_seen = set()
+
+        for node in row.iter():
+            tag = node.tag
+            if tag == 'strong':
+                text = node.first_text()
+                if 'Defeat' in text:
+                    result = 'Defeat'
+                elif 'Victory' in text and result is None:
+                    result = 'Victory'
+                if len(kda) < 3 and id(node) not in kda_seen and self._inside_kda(node, row):
+                    kda_seen.add(id(node))
+                    kda.append(node.text_content())
+                elif queue_type is None and result is None and text.strip() and not self._inside_kda(node, row):
+                    # El primer <strong> de la fila, antes del resultado, es el tipo de cola
+                    queue_type = text.strip()
+            elif tag == 'span':
+                tooltip = node.attrs.get('data-tooltip-content')
+                if tooltip is not None:
+                    # El span con tooltip es la fecha; su texto es relativo ("hace 5 minutos"), no la duración
+                    if timestamp is None and TOOLTIP_DATE_RE.search(tooltip):
+                        timestamp = tooltip
+                    continue
+                text = node.first_text().strip()
+                if duration is None and DURATION_RE.fullmatch(text):
+                    duration = text
+            elif tag == 'img' and champion is None and node.attrs.get('alt'):
+                champion = node.attrs['alt']
+
+        if len(kda) >= 3:
+            kills, deaths, assists = kda
+        else:
+            kills = deaths = assists = None
+        
+        # Un aumento brusco de estos contadores suele indicar un cambio de layout en OP.GG
+        for field, missing in (('result', result is None), ('timestamp', timestamp is None),
+                               ('champion', champion is None), ('kda', len(kda) < 3),
+                               ('duration', duration is None)):
+            if missing:
+                metrics.inc('opgg_parse_fallbacks_total', field=field)
+
+        return Match(result=result, champion=champion, kills=kills, deaths=deaths, assists=assists,
+                     timestamp=timestamp, duration_text=duration, queue=queue_type)
+
+    @staticmethod
+    def _inside_kda(node, row):
+        parent = node.parent
+        while parent is not None and parent is not row:
+            if parent.tag == 'div' and KDA_CONTAINER_CLASSES.issubset(parent.classes):
+                return True
+            parent = parent.parent
+        return False
+
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+# Mismo idioma en HTTP y en Chrome: parse_match_time espera los tooltips en formato dd/mm/aaaa,
+# y si un backend recibiera otro formato la identidad de partida no coincidiría entre ambos
+ACCEPT_LANGUAGE = 'es-ES,es;q=0.9,en;q=0.8'
+NEXT_DATA_RE = re.compile(r'<script[^>]*id="__NEXT_DATA__"[^>]*>(.*?)</script>', re.S)
+
+
+class ProfileSnapshot:
+    """Resultado de una única carga del perfil, del que se derivan todas las vistas del ciclo"""
+
+    def __init__(self, summoner_url, matches, source=None, fingerprint=None):
+        """
+        Args:
+            summoner_url: URL del perfil cargado
+            matches: Partidas parseadas, la más reciente primero
+            source: Nombre del fetcher que obtuvo los datos
+            fingerprint: Huella de la página (ver page_fingerprint)
+        """
+        self.summoner_url = summoner_url
+        self.matches = matches
+        self.source = source
+        self.fingerprint = fingerprint
+        self.fetched_at = datetime.now()
+
+    @property
+    def results(self):
+        """Partidas con resultado conocido (victoria o derrota)"""
+        return [match for match in self.matches if match.result]
+
+    @property
+    def latest(self):
+        """Partida más reciente, o None si la página no tiene partidas"""
+        return self.matches[0] if self.matches else None
+
+    def defeats(self, limit=20):
+        """Derrotas entre las `limit` partidas más recientes"""
+        return [match for match in self.matches[:limit] if match.is_defeat]
+
+
+class FetchError(Exception):
+    """El fetcher no pudo obtener la lista de partidas"""
+
+
+class MatchFetcher:
+    """Interfaz común de los backends que obtienen las partidas de un perfil"""
+    name = 'base'
+    # Huella de la última carga (page_fingerprint o ETag), para que el llamador la guarde
+    last_fingerprint = None
+
+    def fetch(self, summoner_url, limit=None, fingerprint=None):
+        """
+        Devuelve la lista de partidas (Match), la más reciente primero.
+
+        Si `fingerprint` coincide con la huella de la página descargada, devuelve None
+        sin parsear: la lista de partidas no ha cambiado desde esa carga.
+        """
+        raise NotImplementedError
+
+    def parse_if_changed(self, html, limit, fingerprint):
+        """Calcula la huella de `html` y lo parsea solo si difiere de `fingerprint`"""
+        self.last_fingerprint = page_fingerprint(html)
+        if fingerprint and self.last_fingerprint == fingerprint:
+            return None
+        with metrics.time('opgg_stage_seconds', stage='parse'):
+            return self.parser.parse(html, limit=limit)
+
+    def close(self):
+        pass
+
+
+class SeleniumFetcher(MatchFetcher):
+    """Carga el perfil con Chrome y parsea el page_source"""
+    name = 'selenium'
+
+    # Registra en window el instante de la última mutación del DOM
+    OBSERVE_MUTATIONS_JS = """
+        if (!window.__opggObserver) {
+            window.__opggLastMutation = performance.now();
+            window.__opggObserver = new MutationObserver(function () {
+                window.__opggLastMutation = performance.now();
+            });
+            window.__opggObserver.observe(document.body, {childList: true, subtree: true, characterData: true});
+        }
+    """
+    QUIET_FOR_JS = "return performance.now() - (window.__opggLastMutation || 0);"
+
+    def __init__(self, driver_source, parser=None, page_timeout=15, quiet_period=0.5, quiet_timeout=5):
+        """
+        Args:
+            driver_source: Callable que devuelve un context manager con un driver de Chrome
+            parser: MatchPageParser a usar (se crea uno si no se indica)
+            page_timeout: Segundos máximos esperando a que aparezca la primera fila de partida
+            quiet_period: Segundos sin mutaciones del DOM para dar la lista por completa (0 = no esperar)
+            quiet_timeout: Segundos máximos esperando ese silencio antes de parsear igualmente
+        """
+        self.driver_source = driver_source
+        self.parser = parser or MatchPageParser()
+        self.page_timeout = page_timeout
+        self.quiet_period = quiet_period
+        self.quiet_timeout = quiet_timeout
+        self.last_wait_time = None
+        # ProfileRenewer opcional: pulsa Update sobre la página ya cargada, en la misma sesión
+        self.renewer = None
+        self.renewed_in = None
+
+    def fetch(self, summoner_url, limit=None, fingerprint=None):
+        self.renewed_in = None
+        with self.driver_source() as driver:
+            with metrics.time('opgg_stage_seconds', stage='driver_get'):
+                driver.get(summoner_url)
+            
+            started = time.monotonic()
+            try:
+                self.wait_until_ready(driver)
+            finally:
+                self.last_wait_time = time.monotonic() - started
+                metrics.observe('opgg_stage_seconds', self.last_wait_time, stage='wait')
+            
+            # Un único round-trip al navegador; el resto del parseo es local
+            with metrics.time('opgg_stage_seconds', stage='page_source'):
+                html = driver.page_source
+            
+            if self.renewer and self.renewer.ready(summoner_url):
+                self.renewed_in = self.renewer.renew(driver, summoner_url)
+        
+        return self.parse_if_changed(html, limit, fingerprint)
+
+    def wait_until_ready(self, driver):
+        """Espera a que haya filas de partida y, opcionalmente, a que el DOM deje de cambiar"""
+        load_selenium()
+        WebDriverWait(driver, self.page_timeout).until(
+            EC.presence_of_element_located((By.XPATH, MATCH_ROW_XPATH))
+        )
+        
+        if not self.quiet_period:
+            return
+        
+        quiet_ms = self.quiet_period * 1000
+        driver.execute_script(self.OBSERVE_MUTATIONS_JS)
+        try:
+            WebDriverWait(driver, self.quiet_timeout, poll_frequency=0.1).until(
+                lambda d: d.execute_script(self.QUIET_FOR_JS) >= quiet_ms
+            )
+        except TimeoutException:
+            # La página sigue cambiando (anuncios, contadores...), pero las filas ya están
+            pass
+
+
+class HttpFetcher(MatchFetcher):
+    """Descarga el HTML por HTTP y lee el JSON embebido o las filas renderizadas en servidor"""
+    name = 'http'
+
+    def __init__(self, session=None, parser=None, timeout=10):
+        """
+        Args:
+            session: requests.Session compartida (se crea una con pool de conexiones si no se indica)
+            parser: MatchPageParser para el HTML renderizado en servidor
+            timeout: Timeout de cada petición en segundos
+        """
+        load_requests()
+        self.session = session or self.create_session()
+        self.parser = parser or MatchPageParser()
+        self.timeout = timeout
+
+    @staticmethod
+    def create_session(pool_size=10):
+        """Sesión HTTP con conexiones keep-alive reutilizables"""
+        load_requests()
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({'User-Agent': USER_AGENT, 'Accept-Language': ACCEPT_LANGUAGE})
+        return session
+
+    def fetch(self, summoner_url, limit=None, fingerprint=None):
+        # Si la última carga trajo ETag, el servidor puede responder 304 sin enviar la página
+        headers = {}
+        if fingerprint and fingerprint.startswith('etag:'):
+            headers['If-None-Match'] = fingerprint[len('etag:'):]
+        try:
+            with metrics.time('opgg_stage_seconds', stage='http_get'):
+                response = self.session.get(summoner_url, timeout=self.timeout, headers=headers)
+            if response.status_code == 304:
+                self.last_fingerprint = fingerprint
+                return None
+            response.raise_for_status()
+        except requests.RequestException as e:
+            raise FetchError(f"HTTP falló: {e}") from e
+        
+        html = response.text
+        etag = response.headers.get('ETag')
+        self.last_fingerprint = f"etag:{etag}" if etag else page_fingerprint(html)
+        if fingerprint and self.last_fingerprint == fingerprint:
+            return None
+        with metrics.time('opgg_stage_seconds', stage='parse'):
+            matches = self.parse_embedded_json(html) or self.parser.parse(html)
+        if not matches:
+            raise FetchError("No hay partidas en el HTML del servidor")
+        return matches[:limit] if limit is not None else matches
+
+    def parse_embedded_json(self, html):
+        """Extrae las partidas del JSON de hidratación (__NEXT_DATA__) si existe"""
+        found = NEXT_DATA_RE.search(html)
+        if not found:
+            return []
+        try:
+            data = json.loads(found.group(1))
+        except ValueError:
+            return []
+        games = self._find_games(data)
+        return [self._game_to_match(game) for game in games] if games else []
+
+    @classmethod
+    def _find_games(cls, node):
+        """Busca recursivamente la primera lista de partidas (dicts con myData)"""
+        if isinstance(node, list):
+            if node and all(isinstance(item, dict) and 'myData' in item for item in node):
+                return node
+            items = node
+        elif isinstance(node, dict):
+            items = node.values()
+        else:
+            return None
+        for item in items:
+            games = cls._find_games(item)
+            if games:
+                return games
+        return None
+
+    @staticmethod
+    def _game_to_match(game):
+        my_data = game.get('myData') or {}
+        stats = my_data.get('stats') or {}
+        result = {'LOSE': 'Defeat', 'WIN': 'Victory'}.get(stats.get('result'))
+        
+        timestamp = played_at = None
+        if game.get('created_at'):
+            try:
+                played_at = datetime.fromisoformat(game['created_at'])
+                if played_at.tzinfo is None:
+                    played_at = played_at.replace(tzinfo=timezone.utc)
+                played_at = played_at.astimezone()
+                timestamp = played_at.strftime('%d/%m/%Y, %H:%M')
+            except ValueError:
+                pass
+        
+        length = game.get('game_length_second')
+        duration = f"{length // 60}m {length % 60:02d}s" if isinstance(length, int) else None
+        champion = my_data.get('champion_name') or (my_data.get('champion') or {}).get('name')
+        queue_info = game.get('queue_info') or {}
+        queue_type = queue_info.get('queue_translate') or queue_info.get('game_type')
+        
+        return Match(result=result, champion=champion, kills=stats.get('kill'), deaths=stats.get('death'),
+                     assists=stats.get('assist'), timestamp=timestamp, duration_text=duration,
+                     queue=queue_type, played_at=played_at)
+
+
+def default_stats():
+    return {
+        "total_defeats": 0,
+        "current_streak": 0,
+        "max_streak": 0,
+        "last_check": None
+    }
+
+
+def apply_stats_event(stats, event):
+    """Aplica un evento del diario (derrota / victoria) sobre el dict de estadísticas"""
+    if event['type'] == 'defeat':
+        stats['total_defeats'] += 1
+        stats['current_streak'] += 1
+        if stats['current_streak'] > stats['max_streak']:
+            stats['max_streak'] = stats['current_streak']
+    elif event['type'] == 'victory':
+        stats['current_streak'] = 0
+    if event.get('at'):
+        stats['last_check'] = event['at']
+
+
+def format_stats_report(report):
+    """Texto legible (Markdown de Discord) de MatchStore.stats_report"""
+    if not report:
+        return "Sin partidas registradas todavía"
+    lines = [
+        f"**Partidas:** {report['games']} | **Derrotas:** {report['defeats']} ({report['loss_rate']:.0%})",
+        f"**Muertes medias en derrotas:** {report['avg_deaths_in_defeats']:.1f}",
+    ]
+    if report['recent_winrate'] is not None:
+        lines.append(f"**Winrate últimas {report['recent_games']}:** {report['recent_winrate']:.0%}")
+    if report['worst_hour']:
+        hour, games, rate = report['worst_hour']
+        lines.append(f"**Peor hora:** {hour}:00 ({rate:.0%} derrotas en {games} partidas)")
+    if report['worst_champions']:
+        lines.append("**Campeones con más derrotas:**")
+        lines.extend(f"- {name}: {rate:.0%} en {games} partidas" for name, games, rate in report['worst_champions'])
+    if report['queues']:
+        lines.append("**Por cola:** " + ", ".join(
+            f"{name} {rate:.0%} ({games})" for name, (games, rate) in sorted(report['queues'].items())))
+    return "\n".join(lines)
+
+
+def stats_report_embed(summoner_url, report):
+    """Embed de Discord con el resumen agregado (por campeón, hora, cola y ventana reciente)"""
+    load_discord()
+    embed = DiscordEmbed(title='📊 Estadísticas', description=format_stats_report(report), color='5865F2')
+    embed.set_author(name=summoner_name_from_url(summoner_url), url=summoner_url)
+    embed.set_timestamp()
+    return embed
+
+
+class StatsJournal:
+    """Estadísticas persistidas como snapshot JSON + diario de eventos append-only"""
+
+    def __init__(self, snapshot_file, journal_file=None, compact_every=50):
+        """
+        Args:
+            snapshot_file: Snapshot JSON con las estadísticas compactadas (defeat_stats.json)
+            journal_file: Diario JSON-lines con los eventos posteriores al snapshot
+            compact_every: Eventos acumulados tras los que se reescribe el snapshot
+        """
+        self.snapshot_file = snapshot_file
+        self.journal_file = journal_file or f"{snapshot_file}.journal"
+        self.compact_every = compact_every
+        self.seq = 0
+        self.pending_events = 0
+        # Partidas ya contadas en el diario (para no contarlas dos veces tras un crash)
+        self.applied_matches = set()
+
+    def load(self, repair=True):
+        """
+        Reconstruye las estadísticas: snapshot + eventos del diario posteriores a él.
+
+        Args:
+            repair: Truncar la última línea del diario si quedó cortada (False para solo leer,
+                    p. ej. con el monitor escribiendo en paralelo)
+        """
+        stats = default_stats()
+        if os.path.exists(self.snapshot_file):
+            with open(self.snapshot_file, 'r') as f:
+                stats.update(json.load(f))
+        self.seq = stats.pop('journal_seq', 0)
+        
+        self.pending_events = 0
+        self.applied_matches = set()
+        if os.path.exists(self.journal_file):
+            with open(self.journal_file, 'rb+' if repair else 'rb') as f:
+                valid_bytes = 0
+                for line in f:
+                    try:
+                        # Sin '\n' final la escritura no terminó, aunque el JSON parezca completo:
+                        # el siguiente append se pegaría a esta misma línea
+                        if not line.endswith(b'\n'):
+                            raise ValueError("línea sin terminar")
+                        event = json.loads(line)
+                    except ValueError:
+                        # Última línea cortada por un crash a mitad de escritura: se descarta
+                        if repair:
+                            f.truncate(valid_bytes)
+                        break
+                    valid_bytes += len(line)
+                    if event['seq'] <= self.seq:
+                        continue
+                    apply_stats_event(stats, event)
+                    self.seq = event['seq']
+                    self.pending_events += 1
+                    if event.get('match_id'):
+                        self.applied_matches.add(event['match_id'])
+        return stats
+
+    def append(self, stats, event):
+        """Escribe el evento en el diario (fsync) y lo aplica: coste O(1) por evento"""
+        self.seq += 1
+        event = dict(event, seq=self.seq)
+        with open(self.journal_file, 'a') as f:
+            f.write(json.dumps(event) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        apply_stats_event(stats, event)
+        self.pending_events += 1
+        if event.get('match_id'):
+            self.applied_matches.add(event['match_id'])
+
+    def maybe_compact(self, stats):
+        if self.pending_events >= self.compact_every:
+            self.compact(stats)
+
+    def compact(self, stats):
+        """Escribe un snapshot atómico (tmp + rename) y vacía el diario"""
+        tmp_file = f"{self.snapshot_file}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(dict(stats, journal_seq=self.seq), f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.snapshot_file)
+        # Si el proceso muere aquí, los eventos del diario ya están cubiertos por journal_seq
+        with open(self.journal_file, 'w'):
+            pass
+        self.pending_events = 0
+        self.applied_matches = set()
+
+
+class StatsAggregator:
+    """Rollups incrementales sobre el historial: por campeón, día, hora y cola, más ventana móvil"""
+
+    DIMENSIONS = ('all', 'champion', 'day', 'hour', 'queue')
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS rollups (
+            summoner TEXT NOT NULL,
+            dimension TEXT NOT NULL,
+            key TEXT NOT NULL,
+            games INTEGER NOT NULL DEFAULT 0,
+            defeats INTEGER NOT NULL DEFAULT 0,
+            kills INTEGER NOT NULL DEFAULT 0,
+            deaths INTEGER NOT NULL DEFAULT 0,
+            assists INTEGER NOT NULL DEFAULT 0,
+            defeat_deaths INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (summoner, dimension, key)
+        );
+    """
+    UPSERT = """
+        INSERT INTO rollups (summoner, dimension, key, games, defeats, kills, deaths, assists, defeat_deaths)
+        VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?)
+        ON CONFLICT (summoner, dimension, key) DO UPDATE SET
+            games = games + 1,
+            defeats = defeats + excluded.defeats,
+            kills = kills + excluded.kills,
+            deaths = deaths + excluded.deaths,
+            assists = assists + excluded.assists,
+            defeat_deaths = defeat_deaths + excluded.defeat_deaths
+    """
+
+    def __init__(self, conn, window=20):
+        """
+        Args:
+            conn: Conexión SQLite del MatchStore (los rollups viven en la misma base de datos)
+            window: Partidas de la ventana móvil de winrate
+        """
+        self.conn = conn
+        self.window = window
+        self._recent = {}
+        self._recent_last = {}
+        self.conn.executescript(self.SCHEMA)
+
+    @staticmethod
+    def _keys(row):
+        """Claves de cada dimensión para una fila (played_at, champion, queue)"""
+        played_at, champion, queue_type = row
+        keys = {'all': 'all', 'champion': champion or 'Unknown', 'queue': queue_type or 'Unknown'}
+        if played_at:
+            keys['day'] = played_at[:10]
+            keys['hour'] = played_at[11:13]
+        return keys
+
+    def apply(self, summoner, played_at, result, champion, queue_type, kills, deaths, assists):
+        """Suma una partida nueva a todos los rollups: O(1) por partida (llamar dentro de la transacción)"""
+        is_defeat = 1 if result == 'Defeat' else 0
+        kills, deaths, assists = kills or 0, deaths or 0, assists or 0
+        for dimension, key in self._keys((played_at, champion, queue_type)).items():
+            self.conn.execute(self.UPSERT, (summoner, dimension, key, is_defeat, kills, deaths, assists,
+                                            deaths if is_defeat else 0))
+        if summoner in self._recent:
+            if played_at and played_at >= (self._recent_last.get(summoner) or ''):
+                self._recent[summoner].append(is_defeat)
+                self._recent_last[summoner] = played_at
+            else:
+                # Partida antigua (backfill) o sin fecha: la ventana se recarga en la próxima consulta
+                del self._recent[summoner]
+
+    def rebuild(self):
+        """Recalcula todos los rollups desde cero (solo para historiales anteriores a los rollups)"""
+        self.conn.execute('DELETE FROM rollups')
+        rows = self.conn.execute(
+            'SELECT summoner, played_at, result, champion, queue, kills, deaths, assists FROM matches '
+            'WHERE result IS NOT NULL'
+        ).fetchall()
+        self._recent = {}
+        for row in rows:
+            self.apply(*row)
+        return len(rows)
+
+    def recent_results(self, summoner):
+        """Últimos resultados (1 = derrota) de la ventana móvil, cargados de la BD solo la primera vez"""
+        if summoner not in self._recent:
+            rows = self.conn.execute(
+                'SELECT result, played_at FROM matches WHERE summoner = ? AND result IS NOT NULL '
+                'ORDER BY played_at IS NULL, played_at DESC, seen_at DESC LIMIT ?',
+                (summoner, self.window)
+            ).fetchall()
+            self._recent[summoner] = deque((1 if result == 'Defeat' else 0 for result, _ in reversed(rows)),
+                                           maxlen=self.window)
+            self._recent_last[summoner] = max((played_at for _, played_at in rows if played_at), default=None)
+        return self._recent[summoner]
+
+    def rollup(self, summoner, dimension):
+        """Filas del rollup de una dimensión: {clave: {games, defeats, kills, deaths, assists, defeat_deaths}}"""
+        rows = self.conn.execute(
+            'SELECT key, games, defeats, kills, deaths, assists, defeat_deaths FROM rollups '
+            'WHERE summoner = ? AND dimension = ?',
+            (summoner, dimension)
+        ).fetchall()
+        fields = ('games', 'defeats', 'kills', 'deaths', 'assists', 'defeat_deaths')
+        return {row[0]: dict(zip(fields, row[1:])) for row in rows}
+
+
+class MatchStore:
+    """Historial persistente de partidas en SQLite, indexado por identidad estable de partida"""
+    # PRAGMA user_version: versión de match_identity con la que están calculados los match_id
+    IDENTITY_VERSION = 1
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS matches (
+            summoner TEXT NOT NULL,
+            match_id TEXT NOT NULL,
+            played_at TEXT,
+            result TEXT,
+            champion TEXT,
+            kills INTEGER,
+            deaths INTEGER,
+            assists INTEGER,
+            duration TEXT,
+            timestamp TEXT,
+            seen_at TEXT NOT NULL,
+            queue TEXT,
+            PRIMARY KEY (summoner, match_id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_matches_summoner_played_at ON matches (summoner, played_at);
+        CREATE TABLE IF NOT EXISTS backfill_checkpoints (
+            summoner TEXT PRIMARY KEY,
+            rows INTEGER NOT NULL,
+            oldest_played_at TEXT,
+            updated_at TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS baselines (
+            summoner TEXT PRIMARY KEY,
+            taken_at TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, path='matches.db'):
+        """
+        Args:
+            path: Archivo SQLite (':memory:' para pruebas)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ':memory:':
+            self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(self.SCHEMA)
+        self._migrate()
+        self.aggregator = StatsAggregator(self.conn)
+        if self.conn.execute('SELECT 1 FROM rollups LIMIT 1').fetchone() is None:
+            rebuilt = self.aggregator.rebuild()
+            if rebuilt:
+                print(f"📊 Rollups reconstruidos a partir de {rebuilt} partidas")
+        self.conn.commit()
+
+    def _migrate(self):
+        """Añade las columnas nuevas a bases de datos creadas con versiones anteriores"""
+        columns = {row[1] for row in self.conn.execute('PRAGMA table_info(matches)')}
+        if 'queue' not in columns:
+            self.conn.execute('ALTER TABLE matches ADD COLUMN queue TEXT')
+        if self.conn.execute('PRAGMA user_version').fetchone()[0] < self.IDENTITY_VERSION:
+            self._rekey()
+            self.conn.execute(f'PRAGMA user_version = {self.IDENTITY_VERSION}')
+
+    def _rekey(self):
+        """
+        Recalcula los match_id de historiales anteriores con match_identity.
+
+        Antes el fetcher HTTP usaba el id de OP.GG y el HTML un hash que incluía la duración,
+        así que una misma partida podía estar guardada dos veces: se conserva la primera vista.
+        """
+        rows = self.conn.execute(
+            'SELECT summoner, played_at, result, champion, kills, deaths, assists, duration, timestamp, '
+            'seen_at, queue FROM matches ORDER BY seen_at'
+        ).fetchall()
+        if not rows:
+            return
+        kept = {}
+        for row in rows:
+            summoner, played_at, result, champion, kills, deaths, assists = row[:7]
+            when = datetime.fromisoformat(played_at) if played_at else None
+            if when is not None and when.tzinfo is None:
+                when = when.astimezone()
+            kda = '?' if None in (kills, deaths, assists) else f"{kills}/{deaths}/{assists}"
+            kept.setdefault((summoner, match_identity(when, row[8], result, champion, kda)), row)
+        
+        self.conn.execute('DELETE FROM matches')
+        self.conn.executemany(
+            'INSERT INTO matches (summoner, match_id, played_at, result, champion, kills, deaths, assists, '
+            'duration, timestamp, seen_at, queue) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            [(summoner, match_id, *row[1:]) for (summoner, match_id), row in kept.items()]
+        )
+        # Los rollups se recalculan en __init__ sin las partidas duplicadas
+        self.conn.execute('DROP TABLE IF EXISTS rollups')
+        removed = len(rows) - len(kept)
+        print(f"🔑 Historial migrado a la nueva identidad de partida"
+              + (f" ({removed} duplicada(s) eliminada(s))" if removed else ""))
+
+    def has_baseline(self, summoner):
+        """True si ya se tomó la línea base del invocador, aunque entonces no tuviera partidas"""
+        with self._lock:
+            # Historiales anteriores a la tabla baselines: tener partidas equivale a tener línea base
+            row = self.conn.execute(
+                'SELECT 1 FROM baselines WHERE summoner = ? UNION ALL '
+                'SELECT 1 FROM matches WHERE summoner = ? LIMIT 1', (summoner, summoner)
+            ).fetchone()
+        return row is not None
+
+    def add_baseline(self, summoner, matches):
+        """Registra la línea base: las partidas visibles y la marca de que ya se tomó"""
+        self.add(summoner, matches)
+        with self._lock:
+            self.conn.execute('INSERT OR IGNORE INTO baselines (summoner, taken_at) VALUES (?, ?)',
+                              (summoner, datetime.now().isoformat()))
+            self.conn.commit()
+
+    def unseen(self, summoner, matches):
+        """Devuelve las partidas que aún no están en el historial, en el mismo orden"""
+        ids = [match.match_id for match in matches]
+        if not ids:
+            return []
+        placeholders = ','.join('?' * len(ids))
+        with self._lock:
+            known = {row[0] for row in self.conn.execute(
+                f'SELECT match_id FROM matches WHERE summoner = ? AND match_id IN ({placeholders})',
+                [summoner, *ids]
+            )}
+        unseen = []
+        for match, match_id in zip(matches, ids):
+            if match_id not in known:
+                known.add(match_id)
+                unseen.append(match)
+        return unseen
+
+    def add(self, summoner, matches):
+        """Registra partidas como vistas (las ya existentes se ignoran) y actualiza los rollups"""
+        seen_at = datetime.now().isoformat()
+        with self._lock:
+            for match in matches:
+                # Hora local con desfase: el día y la hora de los rollups siguen siendo los del jugador
+                played_at = match.played_at.isoformat() if match.played_at else None
+                inserted = self.conn.execute(
+                    'INSERT OR IGNORE INTO matches (summoner, match_id, played_at, result, champion, kills, '
+                    'deaths, assists, duration, timestamp, seen_at, queue) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (summoner, match.match_id, played_at, match.result, match.champion, match.kills,
+                     match.deaths, match.assists, match.duration_label, match.timestamp, seen_at, match.queue)
+                ).rowcount
+                if inserted and match.result:
+                    self.aggregator.apply(summoner, played_at, match.result, match.champion, match.queue,
+                                          match.kills, match.deaths, match.assists)
+            self.conn.commit()
+
+    def stats_report(self, summoner):
+        """Resumen agregado del invocador leído de los rollups (sin recorrer el historial)"""
+        with self._lock:
+            total = self.aggregator.rollup(summoner, 'all').get('all')
+            if not total:
+                return None
+            champions = self.aggregator.rollup(summoner, 'champion')
+            hours = self.aggregator.rollup(summoner, 'hour')
+            queues = self.aggregator.rollup(summoner, 'queue')
+            recent = list(self.aggregator.recent_results(summoner))
+        
+        def loss_rate(row):
+            return row['defeats'] / row['games'] if row['games'] else 0
+        
+        worst_champions = sorted(
+            ((name, row) for name, row in champions.items() if row['games'] >= 3),
+            key=lambda item: (loss_rate(item[1]), item[1]['games']), reverse=True
+        )
+        # Con pocas partidas una hora o campeón sale al 100%: se exige un mínimo de 3 partidas
+        frequent_hours = [item for item in hours.items() if item[1]['games'] >= 3] or list(hours.items())
+        worst_hour = max(frequent_hours, key=lambda item: (loss_rate(item[1]), item[1]['games']), default=None)
+        return {
+            'games': total['games'],
+            'defeats': total['defeats'],
+            'loss_rate': loss_rate(total),
+            'avg_deaths_in_defeats': total['defeat_deaths'] / total['defeats'] if total['defeats'] else 0,
+            'worst_champions': [(name, row['games'], loss_rate(row)) for name, row in worst_champions[:5]],
+            'worst_hour': (worst_hour[0], worst_hour[1]['games'], loss_rate(worst_hour[1])) if worst_hour else None,
+            'queues': {name: (row['games'], loss_rate(row)) for name, row in queues.items()},
+            'recent_winrate': (len(recent) - sum(recent)) / len(recent) if recent else None,
+            'recent_games': len(recent),
+        }
+
+    def champion_record(self, summoner, champion):
+        """(partidas, derrotas) del invocador con un campeón, leído del rollup"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT games, defeats FROM rollups WHERE summoner = ? AND dimension = 'champion' AND key = ?",
+                (summoner, champion)
+            ).fetchone()
+        return tuple(row) if row else (0, 0)
+
+    def get_checkpoint(self, summoner):
+        """Progreso del último backfill: (filas procesadas, fecha más antigua) o (0, None)"""
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT rows, oldest_played_at FROM backfill_checkpoints WHERE summoner = ?', (summoner,)
+            ).fetchone()
+        return tuple(row) if row else (0, None)
+
+    def save_checkpoint(self, summoner, rows, oldest_played_at):
+        with self._lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO backfill_checkpoints (summoner, rows, oldest_played_at, updated_at) '
+                'VALUES (?, ?, ?, ?)',
+                (summoner, rows, oldest_played_at, datetime.now().isoformat())
+            )
+            self.conn.commit()
+
+    def summoners(self):
+        """Invocadores con partidas en el historial"""
+        with self._lock:
+            return [row[0] for row in self.conn.execute('SELECT DISTINCT summoner FROM matches ORDER BY summoner')]
+
+    def lifetime_stats(self, summoner):
+        """Recalcula derrotas totales y rachas a partir de todo el historial guardado"""
+        stats = default_stats()
+        with self._lock:
+            rows = self.conn.execute(
+                'SELECT result FROM matches WHERE summoner = ? AND result IS NOT NULL '
+                'ORDER BY played_at IS NULL, played_at, seen_at',
+                (summoner,)
+            ).fetchall()
+        for (result,) in rows:
+            apply_stats_event(stats, {'type': 'defeat' if result == 'Defeat' else 'victory'})
+        return stats
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+class AdaptivePollScheduler:
+    """Calcula el siguiente intervalo de comprobación según la actividad del invocador"""
+
+    def __init__(self, base_interval=300, min_interval=60, max_interval=1800, backoff=1.5, jitter=0.1):
+        """
+        Args:
+            base_interval: Intervalo inicial en segundos
+            min_interval: Intervalo justo después de detectar una partida (el jugador suele volver a jugar)
+            max_interval: Intervalo máximo con el perfil inactivo
+            backoff: Factor por el que crece el intervalo en cada comprobación sin cambios
+            jitter: Fracción aleatoria (+/-) aplicada a cada intervalo
+        """
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.backoff = backoff
+        self.jitter = jitter
+        self.interval = self._clamp(base_interval)
+        self._once = None
+
+    def _clamp(self, seconds):
+        return max(self.min_interval, min(self.max_interval, seconds))
+
+    def schedule_once(self, seconds):
+        """Fuerza que la próxima comprobación sea dentro de `seconds` (p. ej. justo tras un Update)"""
+        self._once = seconds
+
+    def next_delay(self, found_new):
+        """Devuelve los segundos hasta la próxima comprobación"""
+        if found_new:
+            self.interval = self.min_interval
+        else:
+            self.interval = self._clamp(self.interval * self.backoff)
+        if self._once is not None:
+            delay, self._once = self._once, None
+            return delay
+        return self._clamp(self.interval * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+
+class NullNotifier:
+    """Notificador que lo descarta todo, para comandos que nunca envían nada (backfill)"""
+
+    def start(self):
+        pass
+
+    def send(self, embed):
+        pass
+
+    def close(self, timeout=10):
+        pass
+
+
+class DiscordNotifier:
+    """Cola de salida hacia Discord servida por un hilo en segundo plano"""
+    MAX_EMBEDS = 10  # Límite de embeds por mensaje de webhook
+
+    def __init__(self, webhook_url, username='LoL Defeat Tracker', spool_file='discord_spool.json',
+                 session=None, timeout=10, max_backoff=300):
+        """
+        Args:
+            webhook_url: URL del webhook de Discord
+            username: Nombre con el que publica el webhook
+            spool_file: Archivo donde se guardan los embeds pendientes para sobrevivir a reinicios
+            session: requests.Session reutilizable (se crea una si no se indica)
+            timeout: Timeout de cada petición en segundos
+            max_backoff: Espera máxima entre reintentos tras errores de red o 5xx
+        """
+        load_requests()
+        load_discord()
+        self.webhook_url = webhook_url
+        self.username = username
+        self.spool_file = spool_file
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pending = self._load_spool()
+        if self._pending:
+            print(f"📬 {len(self._pending)} notificación(es) pendiente(s) recuperada(s) del spool")
+
+    def _load_spool(self):
+        if self.spool_file and os.path.exists(self.spool_file):
+            try:
+                with open(self.spool_file, 'r') as f:
+                    return json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Spool de Discord ilegible, se descarta: {e}")
+        return []
+
+    def _save_spool(self):
+        """Reescribe el spool de forma atómica (llamar con el lock tomado)"""
+        if not self.spool_file:
+            return
+        tmp_file = f"{self.spool_file}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(self._pending, f)
+        os.replace(tmp_file, self.spool_file)
+
+    @property
+    def queue_depth(self):
+        return len(self._pending)
+
+    def start(self):
+        """Arranca el hilo de envío (idempotente)"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._worker, name='discord-notifier', daemon=True)
+        self._thread.start()
+        if self._pending:
+            self._wakeup.set()
+
+    def send(self, embed):
+        """Encola un embed sin bloquear; el hilo de fondo lo entregará"""
+        if isinstance(embed, DiscordEmbed):
+            embed = {key: value for key, value in embed.__dict__.items() if value is not None}
+        with self._lock:
+            self._pending.append(embed)
+            self._save_spool()
+            metrics.set('discord_queue_depth', len(self._pending))
+        self._wakeup.set()
+
+    def close(self, timeout=10):
+        """Intenta vaciar la cola y detiene el hilo; lo no entregado queda en el spool"""
+        if self._thread and self._thread.is_alive():
+            deadline = time.monotonic() + timeout
+            while self._pending and time.monotonic() < deadline:
+                time.sleep(0.1)
+            self._stop.set()
+            self._wakeup.set()
+            self._thread.join(timeout=max(0, deadline - time.monotonic()) + 1)
+        if self._pending:
+            print(f"📬 {len(self._pending)} notificación(es) guardada(s) en {self.spool_file}")
+
+    def _worker(self):
+        failures = 0
+        # Embeds que se envían de uno en uno tras un lote rechazado (para aislar el inválido)
+        solo = 0
+        while not self._stop.is_set():
+            self._wakeup.wait(timeout=1)
+            self._wakeup.clear()
+            
+            while not self._stop.is_set():
+                with self._lock:
+                    batch = self._pending[:1 if solo else self.MAX_EMBEDS]
+                if not batch:
+                    break
+                
+                try:
+                    status, retry_after = self._post(batch)
+                    if status == 'rejected' and len(batch) > 1:
+                        print(f"🔁 Reenviando los {len(batch)} embeds de uno en uno")
+                        solo = len(batch)
+                        continue
+                    if status != 'retry':
+                        failures = 0
+                        solo = max(0, solo - 1)
+                        with self._lock:
+                            del self._pending[:len(batch)]
+                            self._save_spool()
+                            metrics.set('discord_queue_depth', len(self._pending))
+                        continue
+                except Exception as e:
+                    # Un fallo inesperado no puede matar el hilo: la cola dejaría de entregarse
+                    print(f"❌ Error inesperado enviando a Discord: {e}")
+                    metrics.inc('discord_retries_total', reason='error')
+                    retry_after = None
+                
+                if retry_after is None:
+                    failures += 1
+                    retry_after = min(self.max_backoff, 2 ** failures)
+                self._stop.wait(retry_after)
+
+    @staticmethod
+    def _retry_after(response):
+        """Segundos de espera de un 429: `retry_after` del cuerpo JSON o, si no, la cabecera Retry-After"""
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        retry_after = body.get('retry_after') if isinstance(body, dict) else None
+        if retry_after is None:
+            retry_after = response.headers.get('Retry-After', 1)
+        try:
+            return float(retry_after)
+        except (TypeError, ValueError):
+            return 1.0
+
+    def _post(self, batch):
+        """
+        Envía un lote de embeds en un solo mensaje.
+
+        Returns:
+            ('delivered' | 'rejected' | 'retry', segundos a esperar antes de reintentar o None para usar backoff)
+        """
+        payload = {'username': self.username, 'embeds': batch}
+        try:
+            with metrics.time('opgg_stage_seconds', stage='discord_post'):
+                response = self.session.post(self.webhook_url, json=payload, timeout=self.timeout)
+        except requests.RequestException as e:
+            print(f"❌ Error al enviar a Discord: {e}")
+            metrics.inc('discord_retries_total', reason='network')
+            return 'retry', None
+        
+        if response.status_code == 429:
+            retry_after = self._retry_after(response)
+            print(f"⏳ Discord rate limit, reintentando en {retry_after:.1f}s")
+            metrics.inc('discord_retries_total', reason='rate_limit')
+            return 'retry', retry_after
+        
+        if response.status_code >= 500:
+            print(f"❌ Discord respondió {response.status_code}, se reintentará")
+            metrics.inc('discord_retries_total', reason='server_error')
+            return 'retry', None
+        
+        if response.status_code >= 400:
+            # Payload rechazado: reintentarlo bloquearía la cola para siempre
+            print(f"❌ Discord rechazó {len(batch)} embed(s) ({response.status_code}): {response.text[:200]}")
+            return 'rejected', None
+        
+        print(f"✅ {len(batch)} notificación(es) enviada(s) a Discord")
+        metrics.inc('discord_delivered_total', len(batch))
+        return 'delivered', None
+
+
+# Recursos que el scraper nunca lee: imágenes (solo se usa el atributo alt), fuentes, vídeo,
+# anuncios y analítica de terceros
+BLOCKED_URL_PATTERNS = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.avif', '*.svg', '*.ico',
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.mp4', '*.webm', '*.mp3',
+    '*googletagmanager.com*', '*google-analytics.com*', '*doubleclick.net*',
+    '*googlesyndication.com*', '*adservice.google.com*', '*amazon-adsystem.com*',
+    '*facebook.net*', '*hotjar.com*', '*nitropay.com*', '*playwire.com*',
+    '*pubmatic.com*', '*rubiconproject.com*', '*criteo.com*', '*adnxs.com*',
+    '*scorecardresearch.com*', '*quantserve.com*', '*sentry.io*',
+]
+
+
+def create_chrome_driver(lean=True):
+    """
+    Crea un driver de Chrome headless con la configuración del bot.
+
+    Args:
+        lean: Perfil ligero: sin imágenes, fuentes, media ni scripts de terceros y con
+              page load strategy "eager" (las esperas dirigidas de SeleniumFetcher hacen el resto)
+    """
+    load_selenium()
+    chrome_options = Options()
+    chrome_options.add_argument('--headless')  # Ejecutar sin ventana
+    chrome_options.add_argument('--no-sandbox')
+    chrome_options.add_argument('--disable-dev-shm-usage')
+    chrome_options.add_argument('--disable-gpu')
+    chrome_options.add_argument('--window-size=1920,1080')
+    chrome_options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36')
+    chrome_options.add_argument('--lang=es-ES')
+    # Chrome recibe la lista sin pesos y construye con ella la misma cabecera ACCEPT_LANGUAGE
+    prefs = {'intl.accept_languages': 'es-ES,es,en'}
+    
+    if lean:
+        chrome_options.page_load_strategy = 'eager'
+        chrome_options.add_argument('--blink-settings=imagesEnabled=false')
+        chrome_options.add_argument('--disable-extensions')
+        chrome_options.add_argument('--disable-background-networking')
+        chrome_options.add_argument('--mute-audio')
+        prefs.update({
+            'profile.managed_default_content_settings.images': 2,
+            'profile.managed_default_content_settings.media_stream': 2,
+            'profile.managed_default_content_settings.notifications': 2,
+            'profile.managed_default_content_settings.geolocation': 2,
+        })
+    chrome_options.add_experimental_option('prefs', prefs)
+    
+    driver = webdriver.Chrome(options=chrome_options)
+    
+    if lean:
+        # Bloqueo a nivel de red vía CDP: ni siquiera se descargan
+        try:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_URL_PATTERNS})
+        except Exception as e:
+            print(f"⚠️ No se pudo activar el bloqueo de recursos por CDP: {e}")
+    
+    return driver
+
+
+class DriverSupervisor:
+    """Mantiene sano un driver de Chrome de larga duración: reciclado, recuperación y standby"""
+
+    def __init__(self, lean=True, max_navigations=200, max_rss_mb=1500, max_age=6 * 3600,
+                 warm_standby=False, max_restart_backoff=300, slot='main'):
+        """
+        Args:
+            lean: Usar el perfil ligero de Chrome (ver create_chrome_driver)
+            max_navigations: Navegaciones tras las que se recicla el navegador
+            max_rss_mb: Memoria (chromedriver + Chrome) a partir de la que se recicla
+            max_age: Segundos de vida máximos de una instancia
+            warm_standby: Mantener una segunda instancia arrancada para reciclar sin esperas
+            max_restart_backoff: Espera máxima entre reintentos de arranque tras caídas
+            slot: Nombre estable del supervisor en las métricas (sobrevive a los reciclados)
+        """
+        self.slot = slot
+        self.lean = lean
+        self.max_navigations = max_navigations
+        self.max_rss = max_rss_mb * 1024 * 1024 if max_rss_mb else None
+        self.max_age = max_age
+        self.warm_standby = warm_standby
+        self.max_restart_backoff = max_restart_backoff
+        self.driver = None
+        self.navigations = 0
+        self.started_at = None
+        self.failures = 0
+        self._next_start = 0
+        self._standby = None
+        self._standby_thread = None
+
+    def _launch(self):
+        return create_chrome_driver(lean=self.lean)
+
+    def _prepare_standby(self):
+        if not self.warm_standby or self._standby is not None:
+            return
+        if self._standby_thread and self._standby_thread.is_alive():
+            return
+
+        def launch():
+            try:
+                self._standby = self._launch()
+            except Exception as e:
+                print(f"⚠️ No se pudo arrancar el Chrome de reserva: {e}")
+
+        self._standby_thread = threading.Thread(target=launch, name='chrome-standby', daemon=True)
+        self._standby_thread.start()
+
+    def _start(self):
+        # Backoff exponencial si Chrome se está cayendo repetidamente
+        wait = self._next_start - time.monotonic()
+        if wait > 0:
+            print(f"⏳ Esperando {wait:.1f}s antes de reiniciar Chrome...")
+            time.sleep(wait)
+        
+        standby, self._standby = self._standby, None
+        if standby is not None and self.is_alive(standby):
+            self.driver = standby
+        else:
+            try:
+                self.driver = self._launch()
+            except Exception as e:
+                self.failures += 1
+                self._next_start = time.monotonic() + min(self.max_restart_backoff, 2 ** self.failures)
+                print(f"❌ Error al iniciar Chrome: {e}")
+                print("💡 Asegúrate de tener ChromeDriver instalado")
+                raise
+        
+        self.navigations = 0
+        self.started_at = time.monotonic()
+        print("✅ Driver de Chrome iniciado correctamente")
+        self._prepare_standby()
+
+    def _stop(self):
+        driver, self.driver = self.driver, None
+        if driver is None:
+            return
+        metrics.discard('opgg_driver_rss_bytes', slot=self.slot)
+        try:
+            driver.quit()
+        except Exception as e:
+            print(f"⚠️ Error cerrando driver: {e}")
+
+    @staticmethod
+    def is_alive(driver):
+        """Comprueba con una llamada barata si la sesión de WebDriver sigue respondiendo"""
+        try:
+            driver.execute_script('return 1')
+            return True
+        except Exception:
+            return False
+
+    def rss(self):
+        try:
+            pid = self.driver.service.process.pid
+        except AttributeError:
+            return None
+        rss = process_tree_rss(pid)
+        if rss is not None:
+            metrics.set('opgg_driver_rss_bytes', rss, slot=self.slot)
+        return rss
+
+    def _recycle_reason(self):
+        if self.max_navigations and self.navigations >= self.max_navigations:
+            return 'navigations'
+        if self.max_age and time.monotonic() - self.started_at >= self.max_age:
+            return 'age'
+        rss = self.rss()
+        if self.max_rss and rss is not None and rss >= self.max_rss:
+            return 'rss'
+        return None
+
+    def recycle(self, reason):
+        """Sustituye el navegador actual por uno nuevo (el de reserva si existe)"""
+        print(f"♻️ Reciclando Chrome ({reason})")
+        metrics.inc('opgg_driver_restarts_total', reason=reason)
+        self._stop()
+        self._start()
+
+    @contextmanager
+    def session(self):
+        """Presta el driver, arrancándolo o reiniciándolo si hace falta"""
+        if self.driver is None:
+            self._start()
+        
+        try:
+            yield self.driver
+        except Exception:
+            if not self.is_alive(self.driver):
+                print("💥 La sesión de Chrome ha muerto, se reiniciará")
+                metrics.inc('opgg_driver_restarts_total', reason='crash')
+                self.failures += 1
+                self._next_start = time.monotonic() + min(self.max_restart_backoff, 2 ** self.failures)
+                self._stop()
+            raise
+        else:
+            self.failures = 0
+        finally:
+            if self.driver is not None:
+                self.navigations += 1
+                reason = self._recycle_reason()
+                if reason:
+                    self.recycle(reason)
+
+    def close(self):
+        self._stop()
+        if self._standby_thread:
+            self._standby_thread.join(timeout=30)
+        if self._standby is not None:
+            try:
+                self._standby.quit()
+            except Exception:
+                pass
+            self._standby = None
+
+
+class ProfileRenewer:
+    """Pulsa "Update" en el perfil de OP.GG respetando el cooldown de cada invocador"""
+    UPDATE_BUTTON_XPATH = ("//button[contains(., 'Update') or contains(., 'Actualizar') "
+                           "or contains(., 'Renew')]")
+    # Tiempo restante que muestra el botón durante el cooldown ("1:45", "90s", "90 seg")
+    COOLDOWN_RE = re.compile(r'(\d+):(\d{2})|(\d+)\s*(?:s|sec|seg)\b')
+
+    def __init__(self, cooldown=120, refresh_delay=10, page_timeout=15, rate_limiter=None):
+        """
+        Args:
+            cooldown: Segundos entre dos Update del mismo invocador si la página no indica otro
+            refresh_delay: Segundos que tarda OP.GG en renovar el perfil tras pulsar Update
+            page_timeout: Segundos máximos esperando a que aparezca el botón
+            rate_limiter: HostRateLimiter del que cada clic consume un token (None = sin límite)
+        """
+        self.rate_limiter = rate_limiter
+        self.cooldown = cooldown
+        self.refresh_delay = refresh_delay
+        self.page_timeout = page_timeout
+        self.next_allowed = {}
+
+    def ready(self, summoner_url):
+        """True si el cooldown del invocador ya ha pasado"""
+        return time.monotonic() >= self.next_allowed.get(summoner_url, 0)
+
+    def renew(self, driver, summoner_url):
+        """
+        Pulsa Update en el perfil que `driver` acaba de cargar (sin navegar otra vez).
+
+        Returns:
+            Segundos hasta que la renovación debería estar lista, o None si no se pulsó
+        """
+        # El clic es otra petición a OP.GG: sin token libre se deja para la próxima carga
+        if self.rate_limiter and not self.rate_limiter.try_acquire(summoner_url):
+            metrics.inc('opgg_profile_renewals_total', outcome='rate_limited')
+            return None
+        # El cooldown empieza antes de intentarlo: un error tampoco se reintenta en cada ciclo
+        self.next_allowed[summoner_url] = time.monotonic() + self.cooldown
+        load_selenium()
+        try:
+            button = WebDriverWait(driver, self.page_timeout).until(
+                EC.presence_of_element_located((By.XPATH, self.UPDATE_BUTTON_XPATH))
+            )
+            if not button.is_enabled():
+                # Alguien lo renovó hace poco: esperar lo que indique el botón antes de reintentar
+                remaining = self._cooldown_from(button)
+                if remaining:
+                    self.next_allowed[summoner_url] = time.monotonic() + remaining
+                metrics.inc('opgg_profile_renewals_total', outcome='cooldown')
+                return None
+            driver.execute_script("arguments[0].click();", button)
+        except TimeoutException:
+            metrics.inc('opgg_profile_renewals_total', outcome='missing')
+            return None
+        except Exception as e:
+            metrics.inc('opgg_profile_renewals_total', outcome='error')
+            print(f"⚠️ No se pudo actualizar el perfil: {e}")
+            return None
+        metrics.inc('opgg_profile_renewals_total', outcome='clicked')
+        return self.refresh_delay
+
+    def _cooldown_from(self, button):
+        text = ' '.join(filter(None, (button.text, button.get_attribute('aria-label'),
+                                      button.get_attribute('title'))))
+        found = self.COOLDOWN_RE.search(text)
+        if not found:
+            return None
+        minutes, seconds, plain = found.groups()
+        return int(plain) if plain else int(minutes) * 60 + int(seconds)
+
+
+def summoner_name_from_url(summoner_url):
+    """Extrae el nombre del invocador de la URL de OP.GG (p. ej. .../summoners/euw/Kekles-EUW)"""
+    from urllib.parse import unquote, urlparse
+    path = urlparse(summoner_url).path.rstrip('/')
+    return unquote(path.rsplit('/', 1)[-1]) or summoner_url
+
+
+def _stats_slug(text):
+    return re.sub(r'[^A-Za-z0-9_-]+', '_', text).strip('_') or 'summoner'
+
+
+def stats_file_for(summoner_url):
+    """Nombre del archivo de estadísticas propio de cada invocador (región incluida: .../euw/Foo-1234)"""
+    from urllib.parse import unquote, urlparse
+    parts = [unquote(part) for part in urlparse(summoner_url).path.split('/') if part]
+    # El mismo Riot ID en dos regiones son dos cuentas distintas
+    if len(parts) >= 2 and parts[-2].lower() != 'summoners':
+        return f"defeat_stats_{_stats_slug(parts[-2] + '_' + parts[-1])}.json"
+    return f"defeat_stats_{_stats_slug(summoner_name_from_url(summoner_url))}.json"
+
+
+def migrate_stats_file(summoner_url):
+    """Renombra el archivo de estadísticas sin región (versiones anteriores) al nombre actual"""
+    stats_file = stats_file_for(summoner_url)
+    legacy_file = f"defeat_stats_{_stats_slug(summoner_name_from_url(summoner_url))}.json"
+    if legacy_file == stats_file or os.path.exists(stats_file) or os.path.exists(f"{stats_file}.journal"):
+        return stats_file
+    for suffix in ('', '.journal'):
+        if os.path.exists(legacy_file + suffix):
+            os.replace(legacy_file + suffix, stats_file + suffix)
+            print(f"📁 {legacy_file + suffix} renombrado a {stats_file + suffix}")
+    return stats_file
+
 
 class LoLDefeatMonitor:
-    def __init__(self, webhook_url, summoner_url, check_interval=300):
+    def __init__(self, webhook_url, summoner_url, check_interval=300, stats_file="defeat_stats.json",
+                 fetcher='auto', http_session=None, page_timeout=15, quiet_period=0.5,
+                 min_interval=60, max_interval=1800, notifier=None, store=None, lean_browser=True,
+                 driver_options=None, renew_profile=False, renew_cooldown=120, renew_delay=10, rate_limiter=None):
         """
         Args:
             webhook_url: URL del webhook de Discord
             summoner_url: URL del perfil de OP.GG
             check_interval: Intervalo de comprobación en segundos (default: 5 minutos)
+            stats_file: Archivo JSON donde se guardan las estadísticas de este invocador
+            fetcher: 'auto' (HTTP con fallback a Selenium), 'http', 'selenium' o una instancia de MatchFetcher
+            http_session: requests.Session compartida para el fetcher HTTP
+            page_timeout: Segundos máximos esperando las filas de partida en Selenium
+            quiet_period: Segundos sin cambios en el DOM antes de parsear (0 = desactivado)
+            min_interval: Intervalo mínimo del planificador adaptativo (tras una partida nueva)
+            max_interval: Intervalo máximo del planificador adaptativo (perfil inactivo)
+            notifier: DiscordNotifier compartido (se crea uno propio si no se indica)
+            store: MatchStore compartido con el historial de partidas vistas
+            lean_browser: Bloquear imágenes, fuentes y terceros en Chrome (perfil ligero)
+            driver_options: Opciones extra de DriverSupervisor (max_navigations, max_rss_mb...)
+            renew_profile: Pulsar "Update" en OP.GG para que aparezcan las partidas nuevas
+            renew_cooldown: Segundos mínimos entre dos Update del perfil
+            renew_delay: Segundos tras el Update hasta la siguiente lectura
+            rate_limiter: HostRateLimiter compartido del que cada Update consume un token
         """
+        # Los embeds se construyen aquí aunque el notificador inyectado no sea un DiscordNotifier
+        load_discord()
         self.webhook_url = webhook_url
+        self.notifier = notifier or DiscordNotifier(webhook_url)
         self.summoner_url = summoner_url
+        self.summoner_name = summoner_name_from_url(summoner_url)
         self.check_interval = check_interval
-        self.stats_file = "defeat_stats.json"
-        self.last_match_time = None
+        self.scheduler = AdaptivePollScheduler(check_interval, min_interval, max_interval)
+        self.stats_file = stats_file
+        self.store = store or MatchStore()
+        self.journal = StatsJournal(stats_file)
         self.stats = self.load_stats()
-        self.driver = None
+        self.supervisor = DriverSupervisor(lean=lean_browser, slot=self.summoner_name, **(driver_options or {}))
+        self.driver_source = self._own_driver
+        self.parser = MatchPageParser()
+        self.page_timeout = page_timeout
+        self.quiet_period = quiet_period
+        self.fetchers = self.build_fetchers(fetcher, http_session)
+        self.renewer = None
+        if renew_profile:
+            selenium = next((f for f in self.fetchers if isinstance(f, SeleniumFetcher)), None)
+            if selenium is None:
+                print("⚠️ RENEW_PROFILE necesita Selenium: con FETCHER=http no se pulsará Update")
+            else:
+                self.renewer = ProfileRenewer(cooldown=renew_cooldown, refresh_delay=renew_delay,
+                                              page_timeout=page_timeout,
+                                              rate_limiter=rate_limiter or HostRateLimiter())
+                selenium.renewer = self.renewer
+        # Huella de la última página procesada: si no cambia, la comprobación no parsea nada
+        self.fingerprint = None
         self.first_run = True
         
         # Mensajes graciosos para derrotas
@@ -51,222 +1924,85 @@ class LoLDefeatMonitor:
             "🎪 Circo Kekles: Función continua"
         ]
     
-    def setup_driver(self):
-        """Configura el driver de Selenium"""
-        chrome_options = Options()
-        chrome_options.add_argument('--headless')  # Ejecutar sin ventana
-        chrome_options.add_argument('--no-sandbox')
-        chrome_options.add_argument('--disable-dev-shm-usage')
-        chrome_options.add_argument('--disable-gpu')
-        chrome_options.add_argument('--window-size=1920,1080')
-        chrome_options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36')
-        
-        try:
-            self.driver = webdriver.Chrome(options=chrome_options)
-            print("✅ Driver de Chrome iniciado correctamente")
-        except Exception as e:
-            print(f"❌ Error al iniciar Chrome: {e}")
-            print("💡 Asegúrate de tener ChromeDriver instalado")
-            raise
-    
     def load_stats(self):
-        """Carga las estadísticas desde el archivo JSON"""
-        if os.path.exists(self.stats_file):
-            with open(self.stats_file, 'r') as f:
-                return json.load(f)
-        return {
-            "total_defeats": 0,
-            "current_streak": 0,
-            "max_streak": 0,
-            "last_check": None
-        }
+        """Carga las estadísticas desde el snapshot JSON más el diario de eventos"""
+        return self.journal.load()
     
     def save_stats(self):
-        """Guarda las estadísticas en el archivo JSON"""
-        with open(self.stats_file, 'w') as f:
-            json.dump(self.stats, f, indent=2)
+        """Compacta el diario en el snapshot JSON (escritura atómica)"""
+        self.journal.compact(self.stats)
     
-    def get_latest_match(self):
-        """Obtiene información de la última partida usando Selenium"""
-        try:
-            print("⏳ Cargando página...")
-            self.driver.get(self.summoner_url)
-            
-            # Esperar a que carguen las partidas
-            wait = WebDriverWait(self.driver, 15)
-            wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "div.flex.flex-col")))
-            
-            # Dar tiempo extra para que cargue todo
-            time.sleep(3)
-            
-            print("✅ Página cargada, buscando partidas...")
-            
-            # Buscar todos los contenedores de partidas individuales
-            match_containers = self.driver.find_elements(By.XPATH, "//div[contains(@class, 'box-border') and contains(@class, 'flex') and contains(@class, 'w-full') and contains(@class, 'border-l-[6px]')]")
-            
-            if not match_containers:
-                print("❌ No se encontraron partidas")
-                return None
-            
-            print(f"✅ Encontradas {len(match_containers)} partidas")
-            
-            # Obtener la primera partida (más reciente)
-            match_container = match_containers[0]
-            
-            # Detectar si es victoria o derrota
-            try:
-                defeat_elem = match_container.find_element(By.XPATH, ".//strong[contains(text(), 'Defeat')]")
-                is_defeat = True
-                result = "Defeat"
-                print("🔴 Detectada: DERROTA")
-            except NoSuchElementException:
-                try:
-                    victory_elem = match_container.find_element(By.XPATH, ".//strong[contains(text(), 'Victory')]")
-                    is_defeat = False
-                    result = "Victory"
-                    print("🟢 Detectada: VICTORIA")
-                except NoSuchElementException:
-                    print("⚠️ No se pudo determinar el resultado")
-                    return None
-            
-            # Obtener timestamp
-            try:
-                time_elem = match_container.find_element(By.CSS_SELECTOR, "span[data-tooltip-content*='/2025']")
-                match_time = time_elem.get_attribute('data-tooltip-content')
-                print(f"🕒 Timestamp: {match_time}")
-            except:
-                match_time = datetime.now().strftime('%d/%m/%Y, %H:%M')
-                print(f"⚠️ Usando timestamp actual: {match_time}")
-            
-            # Obtener campeón
-            try:
-                champion_img = match_container.find_element(By.CSS_SELECTOR, "img[alt]:not([alt=''])")
-                champion = champion_img.get_attribute('alt')
-                print(f"🎮 Campeón: {champion}")
-            except:
-                champion = "Unknown"
-                print("⚠️ Campeón no encontrado")
-            
-            # Obtener KDA
-            try:
-                kda_elements = match_container.find_elements(By.CSS_SELECTOR, "div.flex.items-center.gap-1 strong")
-                if len(kda_elements) >= 3:
-                    kills = kda_elements[0].text
-                    deaths = kda_elements[1].text
-                    assists = kda_elements[2].text
-                    print(f"📊 KDA: {kills}/{deaths}/{assists}")
-                else:
-                    kills = deaths = assists = "?"
-            except:
-                kills = deaths = assists = "?"
-                print("⚠️ KDA no encontrado")
-            
-            # Obtener duración
-            try:
-                duration_elem = match_container.find_element(By.XPATH, ".//span[contains(text(), 'm') and contains(text(), 's')]")
-                duration = duration_elem.text
-                print(f"⏱️ Duración: {duration}")
-            except:
-                duration = "?"
-                print("⚠️ Duración no encontrada")
-            
-            return {
-                'is_defeat': is_defeat,
-                'result': result,
-                'timestamp': match_time,
-                'champion': champion,
-                'kills': kills,
-                'deaths': deaths,
-                'assists': assists,
-                'duration': duration
-            }
-            
-        except TimeoutException:
-            print("⏱️ Timeout esperando que cargue la página")
-            return None
-        except Exception as e:
-            print(f"❌ Error al obtener datos: {e}")
-            import traceback
-            traceback.print_exc()
-            return None
+    def rebuild_stats_from_store(self):
+        """Sustituye las estadísticas por las calculadas sobre todo el historial (tras un backfill)"""
+        self.stats = self.store.lifetime_stats(self.summoner_url)
+        self.stats['last_check'] = datetime.now().isoformat()
+        self.save_stats()
+        print(f"📊 Estadísticas recalculadas: {self.stats['total_defeats']} derrotas, "
+              f"racha {self.stats['current_streak']}, récord {self.stats['max_streak']}")
     
-    def get_all_recent_matches(self, limit=20):
-        """Obtiene todas las partidas recientes del historial"""
-        try:
-            print("⏳ Cargando historial completo...")
-            self.driver.get(self.summoner_url)
-            
-            wait = WebDriverWait(self.driver, 15)
-            wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "div.flex.flex-col")))
-            time.sleep(3)
-            
-            # Buscar todos los contenedores de partidas individuales
-            match_containers = self.driver.find_elements(By.XPATH, "//div[contains(@class, 'box-border') and contains(@class, 'flex') and contains(@class, 'w-full') and contains(@class, 'border-l-[6px]')]")
-            
-            if not match_containers:
-                return []
-            
-            matches = []
-            for i, container in enumerate(match_containers[:limit]):
-                try:
-                    # Detectar resultado
-                    try:
-                        container.find_element(By.XPATH, ".//strong[contains(text(), 'Defeat')]")
-                        is_defeat = True
-                    except:
-                        is_defeat = False
-                    
-                    if not is_defeat:
-                        continue
-                    
-                    # Obtener timestamp
-                    try:
-                        time_elem = container.find_element(By.CSS_SELECTOR, "span[data-tooltip-content*='/2025']")
-                        match_time = time_elem.get_attribute('data-tooltip-content')
-                    except:
-                        match_time = f"Partida {i+1}"
-                    
-                    # Obtener campeón
-                    try:
-                        champion_img = container.find_element(By.CSS_SELECTOR, "img[alt]:not([alt=''])")
-                        champion = champion_img.get_attribute('alt')
-                    except:
-                        champion = "Unknown"
-                    
-                    # Obtener KDA
-                    try:
-                        kda_elements = container.find_elements(By.CSS_SELECTOR, "div.flex.items-center.gap-1 strong")
-                        if len(kda_elements) >= 3:
-                            kills = kda_elements[0].text
-                            deaths = kda_elements[1].text
-                            assists = kda_elements[2].text
-                        else:
-                            kills = deaths = assists = "?"
-                    except:
-                        kills = deaths = assists = "?"
-                    
-                    matches.append({
-                        'champion': champion,
-                        'kills': kills,
-                        'deaths': deaths,
-                        'assists': assists,
-                        'timestamp': match_time
-                    })
-                    
-                except Exception as e:
-                    print(f"⚠️ Error procesando partida {i+1}: {e}")
-                    continue
-            
-            return matches
-            
-        except Exception as e:
-            print(f"❌ Error obteniendo historial: {e}")
-            return []
+    def record_event(self, event_type, match):
+        """Registra una derrota/victoria en el diario y actualiza las estadísticas en memoria"""
+        self.journal.append(self.stats, {
+            'type': event_type,
+            'match_id': match.match_id,
+            'at': datetime.now().isoformat()
+        })
+    
+    def build_fetchers(self, fetcher, http_session=None):
+        """Crea la cadena de fetchers: el primero que funcione gana"""
+        if isinstance(fetcher, MatchFetcher):
+            return [fetcher]
+        selenium = SeleniumFetcher(lambda: self.driver_source(), self.parser,
+                                   page_timeout=self.page_timeout, quiet_period=self.quiet_period)
+        if fetcher == 'selenium':
+            return [selenium]
+        http = HttpFetcher(session=http_session, parser=self.parser)
+        if fetcher == 'http':
+            return [http]
+        if fetcher == 'auto':
+            return [http, selenium]
+        raise ValueError(f"Fetcher desconocido: {fetcher}")
+    
+    def _own_driver(self):
+        """Driver propio del monitor, arrancado solo cuando hace falta Selenium"""
+        return self.supervisor.session()
+    
+    def load_snapshot(self, limit=None, skip_unchanged=False):
+        """
+        Carga el perfil una sola vez y devuelve un ProfileSnapshot con todas las partidas.
+
+        Con skip_unchanged devuelve None, sin parsear, si la huella de la página coincide
+        con la de la última comprobación procesada.
+        """
+        fetchers = self.fetchers
+        if self.renewer and self.renewer.ready(self.summoner_url):
+            # Toca pulsar Update: Selenium primero, así el clic aprovecha la misma carga
+            fetchers = sorted(fetchers, key=lambda fetcher: not isinstance(fetcher, SeleniumFetcher))
+        
+        last_error = None
+        for fetcher in fetchers:
+            try:
+                matches = fetcher.fetch(self.summoner_url, limit=limit,
+                                        fingerprint=self.fingerprint if skip_unchanged else None)
+                refresh_in = getattr(fetcher, 'renewed_in', None)
+                if refresh_in is not None:
+                    self.scheduler.schedule_once(refresh_in)
+                    print(f"🔄 Perfil actualizado en OP.GG, nueva lectura en {refresh_in:.0f}s")
+                if matches is None:
+                    return None
+                if isinstance(fetcher, SeleniumFetcher):
+                    print(f"⏱️ Espera de carga: {fetcher.last_wait_time:.2f}s")
+                return ProfileSnapshot(self.summoner_url, matches, source=fetcher.name,
+                                       fingerprint=fetcher.last_fingerprint)
+            except Exception as e:
+                last_error = e
+                metrics.inc('opgg_scrape_failures_total', fetcher=fetcher.name)
+                if fetcher is not fetchers[-1]:
+                    print(f"⚠️ Fetcher {fetcher.name} falló ({e}), probando el siguiente...")
+        raise last_error
     
     def send_initial_summary(self, recent_defeats):
         """Envía un resumen inicial de las derrotas recientes"""
-        webhook = DiscordWebhook(url=self.webhook_url, username='LoL Defeat Tracker')
-        
         embed = DiscordEmbed(
             title='🚀 Bot Iniciado - Resumen de Derrotas Recientes',
             description='Aquí están las derrotas más recientes en el historial:',
@@ -283,7 +2019,7 @@ class LoLDefeatMonitor:
             # Mostrar hasta 5 derrotas más recientes
             defeats_text = ""
             for i, match in enumerate(recent_defeats[:5], 1):
-                defeats_text += f"**{i}.** {match['champion']} - {match['kills']}/{match['deaths']}/{match['assists']}\n"
+                defeats_text += f"**{i}.** {match.champion} - {match.kda}\n"
             
             embed.add_embed_field(
                 name=f'💀 Últimas {min(5, len(recent_defeats))} Derrotas',
@@ -311,23 +2047,16 @@ class LoLDefeatMonitor:
             inline=False
         )
         
+        embed.set_author(name=self.summoner_name, url=self.summoner_url)
         embed.set_timestamp()
-        webhook.add_embed(embed)
         
-        try:
-            webhook.execute()
-            print(f"✅ Resumen inicial enviado a Discord")
-        except Exception as e:
-            print(f"❌ Error al enviar resumen inicial: {e}")
+        self.notifier.send(embed)
+        print(f"📨 Resumen inicial encolado para Discord")
     
     def send_defeat_notification(self, match_info):
         """Envía notificación de derrota a Discord"""
-        import random
-        
         message = random.choice(self.defeat_messages)
         
-        webhook = DiscordWebhook(url=self.webhook_url, username='LoL Defeat Tracker')
-        
         # Crear embed
         embed = DiscordEmbed(
             title=f'💀 DERROTA DETECTADA 💀',
@@ -338,9 +2067,9 @@ class LoLDefeatMonitor:
         # Añadir campos
         embed.add_embed_field(
             name='📊 Estadísticas de la Partida',
-            value=f"**Campeón:** {match_info['champion']}\n"
-                  f"**KDA:** {match_info['kills']}/{match_info['deaths']}/{match_info['assists']}\n"
-                  f"**Duración:** {match_info['duration']}",
+            value=f"**Campeón:** {match_info.champion}\n"
+                  f"**KDA:** {match_info.kda}\n"
+                  f"**Duración:** {match_info.duration_label}",
             inline=False
         )
         
@@ -356,6 +2085,15 @@ class LoLDefeatMonitor:
             inline=True
         )
         
+        # La partida actual aún no está en el historial: se suma aquí
+        games, defeats = self.store.champion_record(self.summoner_url, match_info.champion)
+        games, defeats = games + 1, defeats + 1
+        embed.add_embed_field(
+            name=f"🎮 Historial con {match_info.champion}",
+            value=f"**{defeats}** derrotas en {games} partidas ({defeats / games:.0%})",
+            inline=False
+        )
+        
         if self.stats['current_streak'] >= 3:
             embed.add_embed_field(
                 name='⚠️ ALERTA',
@@ -371,22 +2109,16 @@ class LoLDefeatMonitor:
                 inline=False
             )
         
-        embed.set_footer(text=f"Timestamp: {match_info['timestamp']}")
+        embed.set_footer(text=f"Timestamp: {match_info.timestamp or '?'}")
+        embed.set_author(name=self.summoner_name, url=self.summoner_url)
         embed.set_timestamp()
         
-        webhook.add_embed(embed)
-        
-        try:
-            response = webhook.execute()
-            print(f"✅ Notificación enviada a Discord")
-        except Exception as e:
-            print(f"❌ Error al enviar a Discord: {e}")
+        self.notifier.send(embed)
+        print(f"📨 Notificación encolada para Discord")
     
     def send_victory_notification(self, match_info):
         """Envía notificación cuando se rompe la racha de derrotas"""
         if self.stats['current_streak'] >= 3:
-            webhook = DiscordWebhook(url=self.webhook_url, username='LoL Defeat Tracker')
-            
             embed = DiscordEmbed(
                 title='🎉 ¡VICTORIA!',
                 description=f"Se acabó la racha de {self.stats['current_streak']} derrotas 🎊",
@@ -395,20 +2127,143 @@ class LoLDefeatMonitor:
             
             embed.add_embed_field(
                 name='📊 Estadísticas de la Partida',
-                value=f"**Campeón:** {match_info['champion']}\n"
-                      f"**KDA:** {match_info['kills']}/{match_info['deaths']}/{match_info['assists']}\n"
-                      f"**Duración:** {match_info['duration']}",
+                value=f"**Campeón:** {match_info.champion}\n"
+                      f"**KDA:** {match_info.kda}\n"
+                      f"**Duración:** {match_info.duration_label}",
                 inline=False
             )
             
+            embed.set_author(name=self.summoner_name, url=self.summoner_url)
             embed.set_timestamp()
-            webhook.add_embed(embed)
             
-            try:
-                webhook.execute()
-                print(f"✅ Notificación de victoria enviada")
-            except Exception as e:
-                print(f"❌ Error al enviar victoria: {e}")
+            self.notifier.send(embed)
+            print(f"📨 Notificación de victoria encolada")
+    
+    def initialize(self):
+        """Primera ejecución: envía el resumen inicial y procesa esa misma carga contra el historial"""
+        print(f"\n{'='*60}")
+        print(f"📋 Primera ejecución - Analizando historial de {self.summoner_name}...")
+        print(f"{'='*60}\n")
+        
+        # Una sola carga alimenta el resumen inicial y la línea base del historial
+        print("⏳ Cargando historial completo...")
+        try:
+            snapshot = self.load_snapshot()
+        except Exception as e:
+            print(f"❌ Error obteniendo historial: {e}")
+            snapshot = None
+        
+        recent_defeats = snapshot.defeats(limit=20) if snapshot else []
+        print(f"✅ Encontradas {len(recent_defeats)} derrotas en el historial reciente")
+        
+        self.send_initial_summary(recent_defeats)
+        self.first_run = False
+        
+        # La misma carga sirve de primera comprobación: línea base o partidas jugadas con el bot parado
+        if snapshot:
+            self.process_snapshot(snapshot)
+        
+        print(f"\n{'='*60}")
+        print("✅ Inicialización completa - Comenzando monitorización")
+        print(f"{'='*60}\n")
+    
+    def record_baseline(self, snapshot):
+        """Marca como vistas las partidas visibles sin notificarlas (primer arranque del invocador)"""
+        matches = snapshot.results
+        self.store.add_baseline(self.summoner_url, matches)
+        if matches:
+            print(f"🎯 {len(matches)} partidas registradas. Última: {matches[0].timestamp}")
+        else:
+            print("🎯 Perfil sin partidas todavía: se notificarán todas las que aparezcan")
+    
+    def check_for_new_match(self):
+        """Compara toda la lista visible con el historial y procesa cada partida nueva una sola vez"""
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            found_new = self._check_for_new_match()
+            if found_new is not None:
+                outcome = 'new' if found_new else 'unchanged'
+            return bool(found_new)
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.observe('opgg_poll_seconds', elapsed)
+            metrics.inc('opgg_polls_total', outcome=outcome)
+            metrics.log('poll', summoner=self.summoner_name, outcome=outcome, seconds=round(elapsed, 3))
+    
+    def _check_for_new_match(self):
+        """True si hubo partidas nuevas, False si no hubo cambios y None si falló la carga"""
+        try:
+            snapshot = self.load_snapshot(skip_unchanged=True)
+        except TimeoutException:
+            self._print_check_header()
+            print("⏱️ Timeout esperando que cargue la página")
+            return None
+        except Exception as e:
+            self._print_check_header()
+            print(f"❌ Error al obtener datos: {e}")
+            return None
+        
+        # Misma huella que la última comprobación: ni parseo, ni consultas al historial
+        if snapshot is None:
+            print(f"✓ {self.summoner_name}: sin cambios [{datetime.now().strftime('%H:%M:%S')}]")
+            return False
+        
+        self._print_check_header()
+        return self.process_snapshot(snapshot)
+    
+    def process_snapshot(self, snapshot):
+        """Procesa las partidas de `snapshot` que no están en el historial; True si hubo alguna"""
+        # Sin historial previo (primer arranque o falló la carga inicial): línea base sin notificar
+        if not self.store.has_baseline(self.summoner_url):
+            self.record_baseline(snapshot)
+            self.fingerprint = snapshot.fingerprint
+            return False
+        
+        new_matches = self.store.unseen(self.summoner_url, snapshot.results)
+        if not new_matches:
+            print(f"✓ Sin cambios - Última partida ya registrada")
+            self.fingerprint = snapshot.fingerprint
+            return False
+        
+        print(f"\n🆕 {len(new_matches)} partida(s) nueva(s) detectada(s)")
+        
+        # De la más antigua a la más reciente para que las rachas se cuenten en orden
+        for match in reversed(new_matches):
+            # Ya contada en el diario pero no registrada en el historial (crash entre ambos pasos)
+            if match.match_id not in self.journal.applied_matches:
+                self.process_match(match)
+            self.store.add(self.summoner_url, [match])
+        self.journal.maybe_compact(self.stats)
+        # La huella se guarda solo tras procesar todo: si algo falla, la próxima carga se parsea entera
+        self.fingerprint = snapshot.fingerprint
+        return True
+    
+    def _print_check_header(self):
+        print(f"\n{'='*60}")
+        print(f"🔍 Comprobando partidas de {self.summoner_name}... [{datetime.now().strftime('%H:%M:%S')}]")
+        print(f"{'='*60}")
+    
+    def process_match(self, match):
+        """Actualiza rachas y envía la notificación de una partida nueva"""
+        print(f"🆕 {match.result} con {match.champion} [{match.timestamp or '?'}]")
+        
+        # Desde el final de la partida: medir desde el inicio sumaría siempre su duración
+        if match.played_at and match.duration:
+            ended_at = match.played_at + timedelta(seconds=match.duration)
+            metrics.observe('opgg_detection_lag_seconds', (datetime.now(timezone.utc) - ended_at).total_seconds())
+        metrics.log('match', summoner=self.summoner_name, **match.to_dict())
+        
+        if match.is_defeat:
+            # Es una derrota
+            self.record_event('defeat', match)
+            self.send_defeat_notification(match)
+            print(f"💀 DERROTA #{self.stats['total_defeats']} | Racha: {self.stats['current_streak']}")
+        else:
+            # Es una victoria (la notificación necesita la racha antes de reiniciarla)
+            self.send_victory_notification(match)
+            self.record_event('victory', match)
+            print(f"✅ Victoria - Racha de derrotas reiniciada")
     
     def run(self):
         """Ejecuta el monitor continuamente"""
@@ -417,104 +2272,1003 @@ class LoLDefeatMonitor:
         print(f"   - Total derrotas: {self.stats['total_defeats']}")
         print(f"   - Racha actual: {self.stats['current_streak']}")
         print(f"   - Racha máxima: {self.stats['max_streak']}")
-        print(f"⏱️  Comprobando cada {self.check_interval} segundos")
+        print(f"⏱️  Intervalo adaptativo: {self.scheduler.min_interval}-{self.scheduler.max_interval} segundos")
         print(f"🔗 URL: {self.summoner_url}\n")
         
-        # Inicializar el driver
-        self.setup_driver()
+        # Las notificaciones salen por un hilo aparte para no bloquear el scraping
+        self.notifier.start()
         
+        # El driver de Chrome se arranca bajo demanda si el fetcher HTTP no basta
         try:
             # En la primera ejecución, enviar resumen de derrotas recientes
             if self.first_run:
-                print(f"\n{'='*60}")
-                print("📋 Primera ejecución - Analizando historial...")
-                print(f"{'='*60}\n")
-                
-                recent_defeats = self.get_all_recent_matches(limit=20)
-                print(f"✅ Encontradas {len(recent_defeats)} derrotas en el historial reciente")
-                
-                self.send_initial_summary(recent_defeats)
-                self.first_run = False
-                
-                # Obtener la última partida para iniciar el tracking
-                latest = self.get_latest_match()
-                if latest:
-                    self.last_match_time = latest['timestamp']
-                    print(f"🎯 Última partida registrada: {latest['timestamp']}")
-                
-                print(f"\n{'='*60}")
-                print("✅ Inicialización completa - Comenzando monitorización")
-                print(f"{'='*60}\n")
+                self.initialize()
+                # initialize ya hizo la primera comprobación: se espera el intervalo, como el monitor múltiple
+                print(f"\n⏳ Esperando {self.scheduler.interval:.0f} segundos hasta la próxima comprobación...")
+                time.sleep(self.scheduler.interval)
             
             while True:
                 try:
-                    print(f"\n{'='*60}")
-                    print(f"🔍 Comprobando partidas... [{datetime.now().strftime('%H:%M:%S')}]")
-                    print(f"{'='*60}")
-                    
-                    match = self.get_latest_match()
-                    
-                    if match and match['timestamp'] != self.last_match_time:
-                        print(f"\n🆕 Nueva partida detectada: {match['result']}")
-                        
-                        if match['is_defeat']:
-                            # Es una derrota
-                            self.stats['total_defeats'] += 1
-                            self.stats['current_streak'] += 1
-                            
-                            if self.stats['current_streak'] > self.stats['max_streak']:
-                                self.stats['max_streak'] = self.stats['current_streak']
-                            
-                            self.send_defeat_notification(match)
-                            print(f"💀 DERROTA #{self.stats['total_defeats']} | Racha: {self.stats['current_streak']}")
-                        else:
-                            # Es una victoria
-                            self.send_victory_notification(match)
-                            print(f"✅ Victoria - Racha de derrotas reiniciada")
-                            self.stats['current_streak'] = 0
-                        
-                        self.last_match_time = match['timestamp']
-                        self.stats['last_check'] = datetime.now().isoformat()
-                        self.save_stats()
-                    else:
-                        print(f"✓ Sin cambios - Última partida ya registrada")
-                    
-                    print(f"\n⏳ Esperando {self.check_interval} segundos hasta la próxima comprobación...")
-                    time.sleep(self.check_interval)
-                    
+                    found_new = self.check_for_new_match()
                 except Exception as e:
                     print(f"❌ Error en el ciclo: {e}")
-                    time.sleep(self.check_interval)
+                    found_new = False
+                
+                delay = self.scheduler.next_delay(found_new)
+                print(f"\n⏳ Esperando {delay:.0f} segundos hasta la próxima comprobación...")
+                time.sleep(delay)
                     
         except KeyboardInterrupt:
             print("\n\n👋 Monitor detenido por el usuario")
         finally:
-            if self.driver:
-                self.driver.quit()
+            self.save_stats()
+            self.notifier.close()
+            self.store.close()
+            # Sin condición: aunque no haya driver activo puede quedar un Chrome de reserva
+            had_driver = self.supervisor.driver is not None
+            self.supervisor.close()
+            if had_driver:
                 print("🔒 Driver cerrado")
 
-# Ejemplo de uso
-if __name__ == "__main__":
-    # Configuración
-    # Obtener configuración desde .env
-    DISCORD_WEBHOOK_URL = os.getenv('DISCORD_WEBHOOK_URL')
-    SUMMONER_URL = os.getenv('SUMMONER_URL')
-    CHECK_INTERVAL = int(os.getenv('CHECK_INTERVAL', 300))  # 300 por defecto si no existe
-    
-    # Validar que las variables existen
-    if not DISCORD_WEBHOOK_URL:
-        print("❌ ERROR: DISCORD_WEBHOOK_URL no está configurado en .env")
-        exit(1)
-    if not SUMMONER_URL:
-        print("❌ ERROR: SUMMONER_URL no está configurado en .env")
-        exit(1)
+
+class HistoryBackfiller:
+    """Ingesta masiva del historial pulsando "Show more" en el perfil de OP.GG"""
+    SHOW_MORE_XPATH = ("//button[contains(., 'Show more') or contains(., 'Mostrar más') "
+                       "or contains(., 'Ver más')]")
+
+    def __init__(self, monitor, max_games=500, until=None, batch_size=20, step_timeout=10):
+        """
+        Args:
+            monitor: LoLDefeatMonitor del invocador (aporta driver, parser y almacén)
+            max_games: Número máximo de partidas a ingerir
+            until: datetime con zona horaria; se detiene al llegar a partidas anteriores a esta fecha
+            batch_size: Partidas por escritura en el almacén
+            step_timeout: Segundos máximos esperando a que "Show more" añada filas
+        """
+        self.monitor = monitor
+        self.max_games = max_games
+        self.until = until
+        self.batch_size = batch_size
+        self.step_timeout = step_timeout
+        self.fetcher = SeleniumFetcher(monitor.driver_source, monitor.parser,
+                                       page_timeout=monitor.page_timeout, quiet_period=0)
+
+    def _row_count(self, driver):
+        return len(driver.find_elements(By.XPATH, MATCH_ROW_XPATH))
+
+    def _show_more(self, driver, current_rows):
+        """Pulsa "Show more" y espera a que aparezcan filas nuevas; False si no hay más"""
+        buttons = driver.find_elements(By.XPATH, self.SHOW_MORE_XPATH)
+        if not buttons:
+            return False
+        driver.execute_script("arguments[0].click();", buttons[-1])
+        try:
+            WebDriverWait(driver, self.step_timeout, poll_frequency=0.25).until(
+                lambda d: self._row_count(d) > current_rows
+            )
+        except TimeoutException:
+            return False
+        return True
+
+    def run(self):
+        """Ejecuta el backfill y devuelve el número de partidas procesadas"""
+        load_selenium()
+        summoner = self.monitor.summoner_url
+        store = self.monitor.store
+        checkpoint_rows, oldest = store.get_checkpoint(summoner)
+        if checkpoint_rows:
+            print(f"↩️ Reanudando backfill desde la fila {checkpoint_rows} (más antigua: {oldest})")
+        
+        started = time.monotonic()
+        processed = 0
+        with self.monitor.driver_source() as driver:
+            driver.get(summoner)
+            self.fetcher.wait_until_ready(driver)
+            rows = self._row_count(driver)
+            
+            # Reanudar: expandir sin parsear hasta superar lo ya ingerido
+            while rows <= checkpoint_rows and rows < self.max_games:
+                if not self._show_more(driver, rows):
+                    break
+                rows = self._row_count(driver)
+            processed = min(checkpoint_rows, rows)
+            
+            while processed < self.max_games:
+                matches = self.monitor.parser.parse(driver.page_source, limit=self.max_games, skip=processed)
+                if not matches:
+                    if not self._show_more(driver, processed):
+                        break
+                    continue
+                
+                reached_until = False
+                for start in range(0, len(matches), self.batch_size):
+                    batch = [match for match in matches[start:start + self.batch_size] if match.result]
+                    played = [match.played_at for match in batch if match.played_at]
+                    if self.until is not None:
+                        reached_until = reached_until or any(when < self.until for when in played)
+                        # Solo se ingiere lo posterior al corte: lo anterior no debe contar en las rachas
+                        batch = [match for match in batch if match.played_at and match.played_at >= self.until]
+                        played = [when for when in played if when >= self.until]
+                    store.add(summoner, batch)
+                    if played:
+                        oldest = min(played).isoformat()
+                
+                processed += len(matches)
+                store.save_checkpoint(summoner, processed, oldest)
+                elapsed = time.monotonic() - started
+                print(f"📥 {processed} partidas ingeridas ({processed / max(elapsed, 1e-6):.1f} partidas/s)")
+                
+                if reached_until or processed >= self.max_games:
+                    break
+                if not self._show_more(driver, processed):
+                    print("🏁 No hay más partidas en el historial")
+                    break
+        
+        elapsed = time.monotonic() - started
+        print(f"✅ Backfill completado: {processed} partidas en {elapsed:.1f}s")
+        return processed
+
+
+class DriverPool:
+    """Pool fijo de drivers de Chrome compartido entre varios invocadores"""
+    
+    def __init__(self, size=1, acquire_timeout=120, **supervisor_options):
+        """
+        Args:
+            size: Número de instancias de Chrome (la memoria crece con esto, no con los invocadores)
+            acquire_timeout: Espera máxima por un driver libre fuera del ScrapeExecutor
+            supervisor_options: Opciones de cada DriverSupervisor (lean, max_navigations...)
+        """
+        self.size = size
+        self.acquire_timeout = acquire_timeout
+        # Cada hueco del pool es un supervisor que arranca Chrome bajo demanda y lo mantiene sano
+        self.supervisors = [DriverSupervisor(slot=f'pool-{i}', **supervisor_options) for i in range(size)]
+        self._idle = queue.Queue()
+        for supervisor in self.supervisors:
+            self._idle.put(supervisor)
+    
+    @contextmanager
+    def acquire(self):
+        """Presta un driver libre y lo devuelve al pool al terminar"""
+        supervisor = self._wait_idle()
+        try:
+            with supervisor.session() as driver:
+                yield driver
+        finally:
+            self._idle.put(supervisor)
+    
+    def _wait_idle(self):
+        """Espera un supervisor libre sin pasar del deadline de la ScrapeTask en curso"""
+        task = current_scrape_task()
+        deadline = task.deadline if task else time.monotonic() + self.acquire_timeout
+        while True:
+            if task and task.cancelled.is_set():
+                raise FetchError("Comprobación cancelada esperando un navegador libre")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise FetchError("Ningún navegador del pool quedó libre a tiempo")
+            try:
+                # Esperas cortas para notar la cancelación sin depender del deadline
+                return self._idle.get(timeout=min(remaining, 1))
+            except queue.Empty:
+                pass
+    
+    def close(self):
+        """Cierra todas las instancias de Chrome"""
+        for supervisor in self.supervisors:
+            supervisor.close()
+        print("🔒 Pool de drivers cerrado")
+
+
+class TokenBucket:
+    """Token bucket thread-safe: `rate` tokens por segundo con ráfagas de hasta `burst`"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        """Consume un token y devuelve 0, o devuelve los segundos que faltan para el siguiente"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self, timeout=None, cancel=None):
+        """
+        Espera a tener un token.
+
+        Args:
+            timeout: Segundos máximos de espera (None = sin límite)
+            cancel: threading.Event que interrumpe la espera
+
+        Returns:
+            True si se obtuvo el token, False si venció el timeout o se canceló
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait_time = self.try_acquire()
+            if not wait_time:
+                return True
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait_time = min(wait_time, remaining)
+            if cancel is not None:
+                if cancel.wait(wait_time):
+                    return False
+            else:
+                time.sleep(wait_time)
+
+
+class HostRateLimiter:
+    """Un token bucket por host, compartido por todos los hilos que cargan perfiles"""
+
+    def __init__(self, requests_per_minute=30, burst=5):
+        """
+        Args:
+            requests_per_minute: Cargas de perfil por minuto permitidas contra cada host
+            burst: Cargas seguidas permitidas antes de empezar a espaciar
+        """
+        self.requests_per_minute = requests_per_minute
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket_for(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(self.requests_per_minute / 60, self.burst)
+            return self._buckets[host]
+
+    def acquire(self, url, timeout=None, cancel=None):
+        """Espera un token del host de `url` (ver TokenBucket.acquire)"""
+        return self.bucket_for(url).acquire(timeout=timeout, cancel=cancel)
+
+    def try_acquire(self, url):
+        """Consume un token del host de `url` sin esperar; False si no queda ninguno"""
+        return not self.bucket_for(url).try_acquire()
+
+
+_scrape_context = threading.local()
+
+
+def current_scrape_task():
+    """ScrapeTask que ejecuta el hilo actual (None fuera del ScrapeExecutor)"""
+    return getattr(_scrape_context, 'task', None)
+
+
+class ScrapeTask:
+    """Una comprobación de perfil enviada al ScrapeExecutor"""
+
+    def __init__(self, monitor, deadline, action=None):
+        self.monitor = monitor
+        self.deadline = deadline
+        # Por defecto una comprobación normal; la carga inicial pasa monitor.initialize
+        self.action = action or monitor.check_for_new_match
+        self.cancelled = threading.Event()
+        self.timed_out = False
+        self.future = None
+
+
+class ScrapeExecutor:
+    """Comprueba perfiles en paralelo con concurrencia acotada, rate limit por host y timeouts"""
+
+    def __init__(self, max_workers=4, rate_limiter=None, task_timeout=120, throughput_window=300):
+        """
+        Args:
+            max_workers: Comprobaciones simultáneas como máximo
+            rate_limiter: HostRateLimiter compartido (None = sin límite de ritmo)
+            task_timeout: Segundos desde el envío tras los que la tarea se da por vencida
+            throughput_window: Ventana en segundos para calcular los perfiles por minuto
+        """
+        self.max_workers = max_workers
+        self.rate_limiter = rate_limiter
+        self.task_timeout = task_timeout
+        self.throughput_window = throughput_window
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='scrape')
+        self._completed = deque()
+        self._lock = threading.Lock()
+        self.started = time.monotonic()
+
+    def submit(self, monitor, action=None):
+        """Encola la comprobación de un invocador (o `action`, p. ej. su carga inicial) y devuelve su ScrapeTask"""
+        task = ScrapeTask(monitor, time.monotonic() + self.task_timeout, action)
+        task.future = self._executor.submit(self._run, task)
+        return task
+
+    def _run(self, task):
+        """Resultado de task.action (True/False en comprobaciones), o None si se canceló antes de cargar"""
+        remaining = task.deadline - time.monotonic()
+        if task.cancelled.is_set() or remaining <= 0:
+            metrics.inc('opgg_scrape_cancelled_total', reason='deadline')
+            return None
+        # El token se pide justo antes de cargar: el ritmo contra OP.GG no depende de la concurrencia
+        if self.rate_limiter and not self.rate_limiter.acquire(task.monitor.summoner_url, timeout=remaining,
+                                                               cancel=task.cancelled):
+            metrics.inc('opgg_scrape_cancelled_total', reason='rate_limit')
+            return None
+        _scrape_context.task = task
+        try:
+            return task.action()
+        finally:
+            _scrape_context.task = None
+            with self._lock:
+                self._completed.append(time.monotonic())
+
+    def cancel(self, task):
+        """Cancela la tarea: si no ha empezado no llega a ejecutarse; si espera token, deja de esperar"""
+        task.cancelled.set()
+        task.future.cancel()
+
+    def throughput(self):
+        """Perfiles comprobados por minuto en la ventana móvil"""
+        now = time.monotonic()
+        with self._lock:
+            while self._completed and self._completed[0] < now - self.throughput_window:
+                self._completed.popleft()
+            count = len(self._completed)
+        window = min(self.throughput_window, now - self.started)
+        return count * 60 / window if window > 0 else 0.0
+
+    def shutdown(self):
+        """Descarta las tareas pendientes y espera a las que están en curso"""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+class MultiSummonerMonitor:
+    """Monitoriza varios invocadores compartiendo un pool pequeño de navegadores"""
+    
+    def __init__(self, webhook_url, summoner_urls, check_interval=300, pool_size=1, store_path='matches.db',
+                 lean_browser=True, driver_options=None, max_concurrency=4, requests_per_minute=30,
+                 task_timeout=120, **monitor_options):
+        """
+        Args:
+            webhook_url: URL del webhook de Discord
+            summoner_urls: Lista de URLs de perfiles de OP.GG
+            check_interval: Intervalo de comprobación en segundos (default: 5 minutos)
+            pool_size: Número de navegadores compartidos entre todos los perfiles
+            store_path: Archivo SQLite con el historial de partidas de todos los invocadores
+            lean_browser: Usar el perfil ligero de Chrome en el pool
+            driver_options: Opciones extra de DriverSupervisor (max_navigations, max_rss_mb...)
+            max_concurrency: Perfiles comprobados a la vez (con Selenium, el pool también limita)
+            requests_per_minute: Cargas de perfil por minuto contra cada host
+            task_timeout: Segundos máximos por comprobación, contando la espera en cola
+            monitor_options: Opciones extra para cada LoLDefeatMonitor (fetcher, page_timeout...)
+        """
+        self.check_interval = check_interval
+        self.pool = DriverPool(size=pool_size, lean=lean_browser, **(driver_options or {}))
+        self.http_session = HttpFetcher.create_session(pool_size=max(10, max_concurrency))
+        self.rate_limiter = HostRateLimiter(requests_per_minute)
+        self.executor = ScrapeExecutor(max_workers=max_concurrency, rate_limiter=self.rate_limiter,
+                                       task_timeout=task_timeout)
+        # Un único webhook: todas las cuentas comparten cola (y lotes de hasta 10 embeds)
+        self.notifier = DiscordNotifier(webhook_url)
+        self.store = MatchStore(store_path)
+        # Cada invocador mantiene su propio estado (última partida, rachas, archivo de stats)
+        self.monitors = [
+            LoLDefeatMonitor(webhook_url, url, check_interval, stats_file=migrate_stats_file(url),
+                             http_session=self.http_session, notifier=self.notifier, store=self.store,
+                             rate_limiter=self.rate_limiter, **monitor_options)
+            for url in summoner_urls
+        ]
+        for monitor in self.monitors:
+            monitor.driver_source = self.pool.acquire
+    
+    def run(self):
+        """Ejecuta todos los monitores continuamente sobre el pool compartido"""
+        print(f"🚀 Monitor múltiple iniciado: {len(self.monitors)} invocadores, {self.pool.size} navegador(es), "
+              f"{self.executor.max_workers} comprobaciones simultáneas")
+        print(f"⏱️  Intervalo base de {self.check_interval} segundos (adaptativo por invocador)")
+        print(f"🚦 Límite de {self.executor.rate_limiter.requests_per_minute} perfiles/min por host\n")
+        
+        self.notifier.start()
+        
+        try:
+            # Cola de prioridad con la próxima comprobación de cada invocador: (instante, orden, monitor).
+            # Las cargas iniciales también pasan por el executor: concurrencia, rate limit y timeout
+            now = time.monotonic()
+            due = [(now, order, monitor) for order, monitor in enumerate(self.monitors)]
+            heapq.heapify(due)
+            
+            # Cada invocador tiene como mucho una tarea en curso: se replanifica al terminar
+            running = {}
+            last_report = time.monotonic()
+            while True:
+                now = time.monotonic()
+                while due and due[0][0] <= now:
+                    _, order, monitor = heapq.heappop(due)
+                    task = self.executor.submit(monitor, monitor.initialize if monitor.first_run else None)
+                    running[task.future] = (task, order)
+                metrics.set('opgg_scrapes_in_flight', len(running))
+                
+                # Despertar con la próxima comprobación, el próximo timeout o la primera tarea terminada
+                wake_at = [due[0][0]] if due else []
+                wake_at += [task.deadline for task, _ in running.values() if not task.timed_out]
+                timeout = max(0, min(wake_at) - now) if wake_at else None
+                if running:
+                    done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                else:
+                    if timeout >= 1:
+                        print(f"\n⏳ Esperando {timeout:.0f} segundos hasta comprobar {due[0][2].summoner_name}...")
+                    time.sleep(timeout)
+                    done = ()
+                
+                for future in done:
+                    task, order = running.pop(future)
+                    found_new = False
+                    if not future.cancelled():
+                        try:
+                            found_new = bool(future.result())
+                        except Exception as e:
+                            print(f"❌ Error comprobando {task.monitor.summoner_name}: {e}")
+                    if task.action == task.monitor.initialize:
+                        # Tras la carga inicial se espera el intervalo base; si se canceló, first_run sigue activo
+                        scheduler = task.monitor.scheduler
+                        delay = scheduler.min_interval if task.monitor.first_run else scheduler.interval
+                    else:
+                        delay = task.monitor.scheduler.next_delay(found_new)
+                    heapq.heappush(due, (time.monotonic() + delay, order, task.monitor))
+                
+                now = time.monotonic()
+                for task, _ in running.values():
+                    if not task.timed_out and now >= task.deadline:
+                        # Una carga ya iniciada no se puede matar: termina sola (acotada por los timeouts
+                        # del fetcher) y su resultado se aplica igual; lo que aún no empezó no se ejecuta
+                        task.timed_out = True
+                        self.executor.cancel(task)
+                        metrics.inc('opgg_scrape_timeouts_total')
+                        print(f"⏱️ Timeout comprobando {task.monitor.summoner_name}")
+                
+                if now - last_report >= 60:
+                    last_report = now
+                    throughput = self.executor.throughput()
+                    metrics.set('opgg_profiles_per_minute', throughput)
+                    print(f"📈 {throughput:.1f} perfiles/min ({len(running)} en curso)")
+                
+        except KeyboardInterrupt:
+            print("\n\n👋 Monitor detenido por el usuario")
+        finally:
+            self.executor.shutdown()
+            for monitor in self.monitors:
+                monitor.save_stats()
+            self.notifier.close()
+            self.pool.close()
+            self.http_session.close()
+            self.store.close()
+
+
+class SimulatedClock:
+    """Reloj simulado para reproducir horas de sondeo en segundos"""
+
+    def __init__(self):
+        self.now = 0.0
+
+
+class ReplayFetcher(MatchFetcher):
+    """Sirve snapshots grabados del perfil según el reloj simulado, midiendo el parseo"""
+    name = 'replay'
+
+    def __init__(self, pages, clock, parser=None):
+        """
+        Args:
+            pages: Lista de (segundo simulado en que aparece, HTML) ordenada por tiempo
+            clock: SimulatedClock compartido con el harness
+            parser: MatchPageParser a usar
+        """
+        self.pages = pages
+        self.clock = clock
+        self.parser = parser or MatchPageParser()
+        self.parse_times = []
+        self.poll_times = []
+        self.current_page_at = None
+
+    def fetch(self, summoner_url, limit=None, fingerprint=None):
+        visible = [page for page in self.pages if page[0] <= self.clock.now] or self.pages[:1]
+        self.current_page_at, html = visible[-1]
+        started = time.perf_counter()
+        matches = self.parse_if_changed(html, limit, fingerprint)
+        self.poll_times.append(time.perf_counter() - started)
+        if matches is not None:
+            self.parse_times.append(self.poll_times[-1])
+        return matches
+
+
+class StubWebhookServer:
+    """Webhook de Discord local que guarda los payloads recibidos"""
+
+    def __init__(self):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        self.payloads = []
+        received = self.payloads
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                received.append((time.perf_counter(), json.loads(body or b'{}')))
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/webhook"
+        threading.Thread(target=self.server.serve_forever, name='stub-webhook', daemon=True).start()
+
+    def wait_for(self, count, timeout=5):
+        deadline = time.monotonic() + timeout
+        while len(self.payloads) < count and time.monotonic() < deadline:
+            time.sleep(0.005)
+        return len(self.payloads) >= count
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_replay(snapshot_dir, summoners=1, snapshot_interval=900, verbose=False):
+    """
+    Reproduce snapshots grabados como una secuencia de sondeos con reloj simulado.
+
+    Recorre el camino completo detección -> estadísticas -> notificación contra un
+    webhook local y devuelve un informe con tiempos de parseo, latencia de detección,
+    memoria por invocador y la comprobación de las rachas.
+
+    Args:
+        snapshot_dir: Carpeta con los HTML grabados, en orden alfabético
+        summoners: Número de invocadores simulados (todos reproducen los mismos snapshots)
+        snapshot_interval: Segundos simulados entre un snapshot y el siguiente
+        verbose: Mostrar la salida normal del monitor
+    """
+    import io
+    import tempfile
+    import tracemalloc
+    from contextlib import redirect_stdout
+
+    files = sorted(name for name in os.listdir(snapshot_dir) if name.endswith('.html'))
+    if not files:
+        raise ValueError(f"No hay snapshots .html en {snapshot_dir}")
+    pages = []
+    for i, name in enumerate(files):
+        with open(os.path.join(snapshot_dir, name), 'r', encoding='utf-8') as f:
+            pages.append((i * snapshot_interval, f.read()))
+
+    quiet = (lambda: contextmanager(lambda: (yield))()) if verbose else (lambda: redirect_stdout(io.StringIO()))
+    clock = SimulatedClock()
+    webhook = StubWebhookServer()
+    # Spool, base de datos y estadísticas de la reproducción viven solo mientras dura
+    tempdir = tempfile.TemporaryDirectory(prefix='opgg-replay-')
+    workdir = tempdir.name
+    tracemalloc.start()
+    baseline_memory = tracemalloc.get_traced_memory()[0]
+    wall_started = time.perf_counter()
+
+    # El hilo del notificador también imprime, así que se silencia toda la reproducción
+    with quiet():
+        notifier = DiscordNotifier(webhook.url, spool_file=os.path.join(workdir, 'spool.json'))
+        store = MatchStore(os.path.join(workdir, 'matches.db'))
+        monitors = []
+        for i in range(summoners):
+            url = f"https://www.op.gg/summoners/replay/Summoner{i + 1}"
+            monitor = LoLDefeatMonitor(
+                webhook.url, url, stats_file=os.path.join(workdir, f"stats_{i + 1}.json"),
+                fetcher=ReplayFetcher(pages, clock), notifier=notifier, store=store
+            )
+            monitor.initialize()
+            monitors.append(monitor)
+        notifier.start()
+        memory_per_summoner = (tracemalloc.get_traced_memory()[0] - baseline_memory) / summoners
+
+        # Misma planificación que MultiSummonerMonitor, pero avanzando el reloj simulado sin dormir
+        due = [(monitor.scheduler.interval, order, monitor) for order, monitor in enumerate(monitors)]
+        heapq.heapify(due)
+        end_time = pages[-1][0] + max(monitor.scheduler.max_interval for monitor in monitors)
+        detection_lags = []
+        end_to_end = []
+        polls = 0
+        while due and due[0][0] <= end_time:
+            clock.now, order, monitor = heapq.heappop(due)
+            delivered = len(webhook.payloads)
+            started = time.perf_counter()
+            found_new = monitor.check_for_new_match()
+            polls += 1
+            if found_new:
+                fetcher = monitor.fetchers[0]
+                detection_lags.append(clock.now - fetcher.current_page_at)
+                if webhook.wait_for(delivered + 1):
+                    end_to_end.append(webhook.payloads[delivered][0] - started)
+            heapq.heappush(due, (clock.now + monitor.scheduler.next_delay(found_new), order, monitor))
+
+        notifier.close()
+    wall_elapsed = time.perf_counter() - wall_started
+    tracemalloc.stop()
+    webhook.close()
+
+    # Rachas esperadas: todas las partidas que aparecen tras el primer snapshot, en orden cronológico
+    parser = MatchPageParser()
+    initial = {match.match_id for match in parser.parse(pages[0][1]) if match.result}
+    later = {}
+    for _, html in pages[1:]:
+        for match in parser.parse(html):
+            if match.result and match.match_id not in initial:
+                later[match.match_id] = match
+    expected = default_stats()
+    oldest = datetime.min.replace(tzinfo=timezone.utc)
+    for match in sorted(later.values(), key=lambda match: match.played_at or oldest):
+        apply_stats_event(expected, {'type': 'defeat' if match.is_defeat else 'victory'})
+
+    parse_times = [t for monitor in monitors for t in monitor.fetchers[0].parse_times]
+    poll_times = [t for monitor in monitors for t in monitor.fetchers[0].poll_times]
+    streaks_ok = all(
+        all(monitor.stats[key] == expected[key] for key in ('total_defeats', 'current_streak', 'max_streak'))
+        for monitor in monitors
+    )
+    store.close()
+    tempdir.cleanup()
+    return {
+        'snapshots': len(pages),
+        'summoners': summoners,
+        'polls': polls,
+        'simulated_seconds': clock.now,
+        'wall_seconds': wall_elapsed,
+        'parsed_polls': len(parse_times),
+        'poll_ms_avg': 1000 * sum(poll_times) / len(poll_times),
+        'parse_ms_avg': 1000 * sum(parse_times) / len(parse_times),
+        'parse_ms_p95': 1000 * _percentile(parse_times, 0.95),
+        'detection_lag_avg': sum(detection_lags) / len(detection_lags) if detection_lags else None,
+        'detection_lag_max': max(detection_lags) if detection_lags else None,
+        'end_to_end_ms_avg': 1000 * sum(end_to_end) / len(end_to_end) if end_to_end else None,
+        'webhook_calls': len(webhook.payloads),
+        'embeds_delivered': sum(len(payload.get('embeds', [])) for _, payload in webhook.payloads),
+        'memory_kb_per_summoner': memory_per_summoner / 1024,
+        'stats': [monitor.stats for monitor in monitors],
+        'expected_stats': expected,
+        'streaks_ok': streaks_ok,
+    }
+
+
+def print_replay_report(report):
+    """Muestra el informe de run_replay"""
+    def seconds(value):
+        return f"{value:.0f}s" if value is not None else "-"
+
+    print(f"🎬 Replay: {report['snapshots']} snapshots, {report['summoners']} invocador(es), {report['polls']} sondeos")
+    print(f"⏱️  {report['simulated_seconds']:.0f}s simulados en {report['wall_seconds']:.2f}s reales")
+    print(f"🧩 Parseo por página: {report['parse_ms_avg']:.2f} ms (p95 {report['parse_ms_p95']:.2f} ms)")
+    print(f"🔎 Páginas parseadas: {report['parsed_polls']} de {report['polls']} "
+          f"(media por carga {report['poll_ms_avg']:.2f} ms)")
+    print(f"🎯 Latencia de detección simulada: media {seconds(report['detection_lag_avg'])}, "
+          f"máx {seconds(report['detection_lag_max'])}")
+    if report['end_to_end_ms_avg'] is not None:
+        print(f"📨 Detección -> webhook: {report['end_to_end_ms_avg']:.1f} ms de media")
+    print(f"📬 {report['webhook_calls']} llamadas al webhook, {report['embeds_delivered']} embeds")
+    print(f"🧠 Memoria por invocador: {report['memory_kb_per_summoner']:.1f} KB")
+    keys = ('total_defeats', 'current_streak', 'max_streak')
+    got = {key: report['stats'][0][key] for key in keys}
+    expected = {key: report['expected_stats'][key] for key in keys}
+    print(f"{'✅' if report['streaks_ok'] else '❌'} Rachas: {got} (esperado {expected})")
+
+
+def load_config():
+    """
+    Lee la configuración de las variables de entorno (.env).
+
+    Returns:
+        (config, errors): dict con la configuración y lista de valores con formato inválido
+    """
+    errors = []
     
+    def number(name, default, cast=int):
+        raw = os.getenv(name)
+        if raw in (None, ''):
+            return default
+        try:
+            return cast(raw)
+        except ValueError:
+            errors.append(f"{name} debe ser un número (valor actual: {raw!r})")
+            return default
+    
+    config = {
+        'DISCORD_WEBHOOK_URL': os.getenv('DISCORD_WEBHOOK_URL'),
+        'SUMMONER_URL': os.getenv('SUMMONER_URL'),
+        # Lista opcional de perfiles separados por comas para monitorizar varias cuentas
+        'SUMMONER_URLS': [url.strip() for url in os.getenv('SUMMONER_URLS', '').split(',') if url.strip()],
+        'CHECK_INTERVAL': number('CHECK_INTERVAL', 300),  # 300 por defecto si no existe
+        'POOL_SIZE': number('POOL_SIZE', 1),
+        'MAX_CONCURRENCY': number('MAX_CONCURRENCY', 4),  # Perfiles comprobados a la vez
+        'RATE_LIMIT_PER_MIN': number('RATE_LIMIT_PER_MIN', 30, float),  # Cargas de perfil por minuto y host
+        'TASK_TIMEOUT': number('TASK_TIMEOUT', 120, float),  # Segundos máximos por comprobación
+        'FETCHER': os.getenv('FETCHER', 'auto'),  # auto, http o selenium
+        'PAGE_TIMEOUT': number('PAGE_TIMEOUT', 15, float),
+        'QUIET_PERIOD': number('QUIET_PERIOD', 0.5, float),  # 0 desactiva la espera de DOM estable
+        'MIN_INTERVAL': number('MIN_INTERVAL', 60),  # Sondeo rápido tras una partida nueva
+        'MAX_INTERVAL': number('MAX_INTERVAL', 1800),  # Límite del backoff con el perfil inactivo
+        'MATCH_DB': os.getenv('MATCH_DB', 'matches.db'),  # Historial SQLite de partidas vistas
+        'LEAN_BROWSER': os.getenv('LEAN_BROWSER', '1') != '0',  # 0 = Chrome completo (imágenes, fuentes...)
+        # Salud del navegador en procesos de larga duración
+        'DRIVER_OPTIONS': {
+            'max_navigations': number('DRIVER_MAX_NAVIGATIONS', 200),
+            'max_rss_mb': number('DRIVER_MAX_RSS_MB', 1500),
+            'max_age': number('DRIVER_MAX_AGE', 6 * 3600),
+            'warm_standby': os.getenv('DRIVER_WARM_STANDBY', '0') == '1',
+        },
+        'RENEW_PROFILE': os.getenv('RENEW_PROFILE', '0') == '1',  # Pulsar "Update" en OP.GG en cada ciclo
+        'RENEW_COOLDOWN': number('RENEW_COOLDOWN', 120),  # Segundos mínimos entre Update del mismo perfil
+        'RENEW_DELAY': number('RENEW_DELAY', 10),  # Segundos entre el Update y la lectura del perfil
+        'METRICS_PORT': number('METRICS_PORT', None),  # Si se define, expone /metrics en ese puerto
+        'METRICS_JSON_LOG': os.getenv('METRICS_JSON_LOG'),  # Archivo de logs estructurados en JSON
+    }
+    return config, errors
+
+
+def validate_config(config, errors=()):
+    """Comprueba la configuración sin importar backends ni abrir el navegador; devuelve los errores"""
+    errors = list(errors)
+    if not config['DISCORD_WEBHOOK_URL']:
+        errors.append("DISCORD_WEBHOOK_URL no está configurado en .env")
+    elif urlparse(config['DISCORD_WEBHOOK_URL']).scheme not in ('http', 'https'):
+        errors.append("DISCORD_WEBHOOK_URL no es una URL http(s)")
+    
+    urls = summoner_urls(config)
+    if not urls:
+        errors.append("SUMMONER_URL o SUMMONER_URLS no está configurado en .env")
+    for url in urls:
+        parsed = urlparse(url)
+        if parsed.scheme not in ('http', 'https') or not parsed.netloc:
+            errors.append(f"URL de perfil no válida: {url}")
+    
+    if config['FETCHER'] not in ('auto', 'http', 'selenium'):
+        errors.append(f"FETCHER debe ser auto, http o selenium (valor actual: {config['FETCHER']!r})")
+    if config['MIN_INTERVAL'] > config['MAX_INTERVAL']:
+        errors.append("MIN_INTERVAL no puede ser mayor que MAX_INTERVAL")
+    for name in ('CHECK_INTERVAL', 'POOL_SIZE', 'MAX_CONCURRENCY', 'RATE_LIMIT_PER_MIN', 'TASK_TIMEOUT'):
+        if config[name] <= 0:
+            errors.append(f"{name} debe ser mayor que 0")
+    return errors
+
+
+def summoner_urls(config):
+    """Perfiles configurados: SUMMONER_URLS o, si no hay, SUMMONER_URL"""
+    return config['SUMMONER_URLS'] or ([config['SUMMONER_URL']] if config['SUMMONER_URL'] else [])
+
+
+def check_config(config, errors):
+    """Muestra los errores de configuración; True si se puede continuar"""
+    errors = validate_config(config, errors)
+    for error in errors:
+        print(f"❌ ERROR: {error}")
+    return not errors
+
+
+def setup_metrics(config):
+    metrics.json_log_file = config['METRICS_JSON_LOG']
+    if config['METRICS_PORT']:
+        metrics.serve(config['METRICS_PORT'])
+
+
+def cmd_validate_config(config, errors, args):
+    """Valida la configuración y resume lo que haría `run`, en milisegundos y sin navegador"""
+    if not check_config(config, errors):
+        return 1
+    urls = summoner_urls(config)
+    backends = {'auto': 'HTTP (Selenium solo si HTTP falla)', 'http': 'HTTP', 'selenium': 'Selenium'}
+    print("✅ Configuración válida")
+    print(f"👥 {len(urls)} invocador(es): {', '.join(summoner_name_from_url(url) for url in urls)}")
+    print(f"🌐 Fetcher: {backends[config['FETCHER']]}")
+    print(f"⏱️  Intervalo: {config['CHECK_INTERVAL']}s (adaptativo {config['MIN_INTERVAL']}-{config['MAX_INTERVAL']}s)")
+    print(f"🗄️  Historial: {config['MATCH_DB']}")
+    if len(urls) > 1:
+        print(f"🚦 {config['MAX_CONCURRENCY']} comprobaciones simultáneas, "
+              f"{config['RATE_LIMIT_PER_MIN']:g} perfiles/min por host, {config['POOL_SIZE']} navegador(es)")
+    if config['RENEW_PROFILE'] and config['FETCHER'] == 'http':
+        print("⚠️ RENEW_PROFILE no tiene efecto con FETCHER=http (el Update necesita Selenium)")
+    elif config['RENEW_PROFILE']:
+        print(f"🔄 Update automático cada {config['RENEW_COOLDOWN']}s como mínimo")
+    return 0
+
+
+def cmd_run(config, errors, args):
+    """Monitoriza los perfiles configurados"""
+    if args.dry_run:
+        return cmd_validate_config(config, errors, args)
+    if not check_config(config, errors):
+        return 1
     print("✅ Configuración cargada desde .env")
+    setup_metrics(config)
+    
+    monitor_options = dict(
+        fetcher=config['FETCHER'],
+        page_timeout=config['PAGE_TIMEOUT'],
+        quiet_period=config['QUIET_PERIOD'],
+        min_interval=config['MIN_INTERVAL'],
+        max_interval=config['MAX_INTERVAL'],
+        lean_browser=config['LEAN_BROWSER'],
+        driver_options=config['DRIVER_OPTIONS'],
+        renew_profile=config['RENEW_PROFILE'],
+        renew_cooldown=config['RENEW_COOLDOWN'],
+        renew_delay=config['RENEW_DELAY']
+    )
+    
+    if config['SUMMONER_URLS']:
+        MultiSummonerMonitor(
+            webhook_url=config['DISCORD_WEBHOOK_URL'],
+            summoner_urls=config['SUMMONER_URLS'],
+            check_interval=config['CHECK_INTERVAL'],
+            pool_size=config['POOL_SIZE'],
+            store_path=config['MATCH_DB'],
+            max_concurrency=config['MAX_CONCURRENCY'],
+            requests_per_minute=config['RATE_LIMIT_PER_MIN'],
+            task_timeout=config['TASK_TIMEOUT'],
+            **monitor_options
+        ).run()
+        return 0
+    
     # Crear y ejecutar el monitor
     monitor = LoLDefeatMonitor(
-        webhook_url=DISCORD_WEBHOOK_URL,
-        summoner_url=SUMMONER_URL,
-        check_interval=CHECK_INTERVAL
+        webhook_url=config['DISCORD_WEBHOOK_URL'],
+        summoner_url=config['SUMMONER_URL'],
+        check_interval=config['CHECK_INTERVAL'],
+        store=MatchStore(config['MATCH_DB']),
+        rate_limiter=HostRateLimiter(config['RATE_LIMIT_PER_MIN']),
+        **monitor_options
+    )
+    monitor.run()
+    return 0
+
+
+def cmd_backfill(config, errors, args):
+    """Ingesta masiva del historial con "Show more" (necesita Selenium)"""
+    if not check_config(config, errors):
+        return 1
+    try:
+        until = datetime.strptime(args.until, '%Y-%m-%d').astimezone() if args.until else None
+    except ValueError:
+        print(f"❌ ERROR: fecha no válida {args.until!r}, usa AAAA-MM-DD")
+        return 1
+    setup_metrics(config)
+    
+    store = MatchStore(config['MATCH_DB'])
+    for url in summoner_urls(config):
+        monitor = LoLDefeatMonitor(
+            webhook_url=config['DISCORD_WEBHOOK_URL'],
+            summoner_url=url,
+            stats_file=migrate_stats_file(url) if config['SUMMONER_URLS'] else "defeat_stats.json",
+            notifier=NullNotifier(),
+            store=store,
+            page_timeout=config['PAGE_TIMEOUT'],
+            lean_browser=config['LEAN_BROWSER'],
+            driver_options=config['DRIVER_OPTIONS']
+        )
+        try:
+            HistoryBackfiller(monitor, max_games=args.games, until=until).run()
+            monitor.rebuild_stats_from_store()
+        finally:
+            monitor.supervisor.close()
+    store.close()
+    return 0
+
+
+def cmd_stats(config, errors, args):
+    """Muestra las estadísticas guardadas (JSON + diario y, si existe, el historial SQLite)"""
+    if config['SUMMONER_URLS']:
+        stats_files = [(summoner_name_from_url(url), stats_file_for(url)) for url in config['SUMMONER_URLS']]
+    else:
+        name = summoner_name_from_url(config['SUMMONER_URL']) if config['SUMMONER_URL'] else 'defeat_stats.json'
+        stats_files = [(name, args.stats_file)]
+    
+    found = False
+    for name, stats_file in stats_files:
+        if not os.path.exists(stats_file) and not os.path.exists(f"{stats_file}.journal"):
+            continue
+        found = True
+        # Solo lectura: el monitor puede estar escribiendo el diario ahora mismo
+        stats = StatsJournal(stats_file).load(repair=False)
+        print(f"📈 {name}")
+        print(f"   - Total derrotas: {stats['total_defeats']}")
+        print(f"   - Racha actual: {stats['current_streak']}")
+        print(f"   - Racha máxima: {stats['max_streak']}")
+        print(f"   - Última actualización: {stats['last_check'] or '-'}")
+    
+    if args.discord and not check_config(config, errors):
+        return 1
+    
+    if os.path.exists(config['MATCH_DB']):
+        store = MatchStore(config['MATCH_DB'])
+        notifier = None
+        if args.discord:
+            notifier = DiscordNotifier(config['DISCORD_WEBHOOK_URL'])
+            notifier.start()
+        try:
+            for summoner in store.summoners():
+                found = True
+                report = store.stats_report(summoner)
+                print(f"\n📊 {summoner_name_from_url(summoner)} ({config['MATCH_DB']})")
+                print(format_stats_report(report))
+                if notifier:
+                    notifier.send(stats_report_embed(summoner, report))
+                    print("📨 Resumen de estadísticas encolado para Discord")
+        finally:
+            store.close()
+            if notifier:
+                notifier.close()
+    
+    if not found:
+        print("ℹ️ No hay estadísticas guardadas todavía")
+    return 0
+
+
+def cmd_replay(config, errors, args):
+    """Reproduce snapshots grabados con reloj simulado (sin red ni navegador)"""
+    if not os.path.isdir(args.snapshot_dir):
+        print(f"❌ ERROR: no existe la carpeta de snapshots {args.snapshot_dir!r}")
+        return 1
+    try:
+        report = run_replay(args.snapshot_dir, summoners=args.summoners)
+    except ValueError as e:
+        print(f"❌ ERROR: {e}")
+        return 1
+    print_replay_report(report)
+    return 0 if report['streaks_ok'] else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='op.ggBotTracker.py',
+        description='Monitoriza derrotas de LoL en OP.GG y las notifica a Discord. '
+                    'La configuración se lee de las variables de entorno (.env).'
     )
+    commands = parser.add_subparsers(dest='command', metavar='comando')
+    
+    run_parser = commands.add_parser('run', help='Monitoriza los perfiles (comando por defecto)')
+    run_parser.add_argument('--dry-run', action='store_true',
+                            help='Valida la configuración y sale sin cargar backends ni abrir el navegador')
+    run_parser.set_defaults(handler=cmd_run)
     
-    monitor.run()
\ No newline at end of file
+    validate_parser = commands.add_parser('validate-config', help='Valida la configuración y sale')
+    validate_parser.set_defaults(handler=cmd_validate_config)
+    
+    backfill_parser = commands.add_parser('backfill', help='Importa el historial antiguo pulsando "Show more"')
+    backfill_parser.add_argument('--games', type=int, default=500, help='Partidas máximas (500)')
+    backfill_parser.add_argument('--until', metavar='AAAA-MM-DD', help='Parar al llegar a esta fecha')
+    backfill_parser.set_defaults(handler=cmd_backfill)
+    
+    stats_parser = commands.add_parser('stats', help='Muestra las estadísticas guardadas sin abrir el navegador')
+    stats_parser.add_argument('--stats-file', default='defeat_stats.json',
+                              help='Archivo de estadísticas con un solo invocador (defeat_stats.json)')
+    stats_parser.add_argument('--discord', action='store_true',
+                              help='Envía además el resumen del historial SQLite al webhook de Discord')
+    stats_parser.set_defaults(handler=cmd_stats)
+    
+    replay_parser = commands.add_parser('replay', help='Benchmark offline con snapshots grabados')
+    replay_parser.add_argument('snapshot_dir', nargs='?', default=os.path.join('fixtures', 'replay'))
+    replay_parser.add_argument('--summoners', type=int, default=1, help='Invocadores simulados (1)')
+    replay_parser.set_defaults(handler=cmd_replay)
+    
+    args = parser.parse_args(argv)
+    if args.command is None:
+        # Sin subcomando se monitoriza, como antes de la CLI
+        args = parser.parse_args(['run'])
+    
+    config, errors = load_config()
+    return args.handler(config, errors, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,15 @@
+import importlib.util
+import os
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='session')
+def bot():
+    # El nombre del script lleva un punto, así que no se puede importar con `import`
+    spec = importlib.util.spec_from_file_location('opgg_bot_tracker', os.path.join(ROOT, 'op.ggBotTracker.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,46 @@
+import json
+
+
+def defeat(match_id):
+    return {'type': 'defeat', 'match_id': match_id}
+
+
+def test_replays_journal_after_snapshot(bot, tmp_path):
+    journal = bot.StatsJournal(str(tmp_path / 'stats.json'))
+    stats = journal.load()
+    journal.append(stats, defeat('a'))
+    journal.compact(stats)
+    journal.append(stats, defeat('b'))
+
+    reloaded = bot.StatsJournal(str(tmp_path / 'stats.json'))
+    assert reloaded.load()['total_defeats'] == 2
+    assert reloaded.applied_matches == {'b'}
+
+
+def test_torn_line_without_newline_is_discarded(bot, tmp_path):
+    # Crash justo antes del '\n': el JSON está completo pero la escritura no terminó
+    journal = bot.StatsJournal(str(tmp_path / 'stats.json'))
+    stats = journal.load()
+    journal.append(stats, defeat('a'))
+    with open(journal.journal_file, 'a') as f:
+        f.write(json.dumps(dict(defeat('b'), seq=2)))
+
+    recovered = bot.StatsJournal(str(tmp_path / 'stats.json'))
+    stats = recovered.load()
+    assert stats['total_defeats'] == 1
+    recovered.append(stats, defeat('c'))
+
+    # El evento nuevo va en su propia línea y sobrevive a la siguiente carga
+    assert bot.StatsJournal(str(tmp_path / 'stats.json')).load()['total_defeats'] == 2
+
+
+def test_read_only_load_leaves_torn_line(bot, tmp_path):
+    journal = bot.StatsJournal(str(tmp_path / 'stats.json'))
+    stats = journal.load()
+    journal.append(stats, defeat('a'))
+    with open(journal.journal_file, 'a') as f:
+        f.write('{"type": "def')
+    size = (tmp_path / 'stats.json.journal').stat().st_size
+
+    assert bot.StatsJournal(str(tmp_path / 'stats.json')).load(repair=False)['total_defeats'] == 1
+    assert (tmp_path / 'stats.json.journal').stat().st_size == size
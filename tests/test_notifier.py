@@ -0,0 +1,75 @@
+import time
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None, headers=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+        self.text = str(body)
+
+    def json(self):
+        if self.body is None:
+            raise ValueError("sin JSON")
+        return self.body
+
+
+class FakeSession:
+    """Responde según `reply(embeds)` y guarda los lotes recibidos"""
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.batches = []
+
+    def post(self, url, json, timeout):
+        embeds = [embed['title'] for embed in json['embeds']]
+        self.batches.append(embeds)
+        return self.reply(embeds)
+
+
+def drain(bot, session, titles, tmp_path):
+    notifier = bot.DiscordNotifier('http://discord.invalid/webhook', spool_file=str(tmp_path / 'spool.json'),
+                                   session=session, max_backoff=0.05)
+    for title in titles:
+        notifier.send({'title': title})
+    notifier.start()
+    deadline = time.monotonic() + 5
+    while notifier.queue_depth and time.monotonic() < deadline:
+        time.sleep(0.01)
+    notifier.close(timeout=1)
+    return notifier
+
+
+def test_rate_limit_with_non_dict_body_keeps_worker_alive(bot, tmp_path):
+    replies = iter([FakeResponse(429, body=['no es un dict'], headers={'Retry-After': '0.01'})])
+    session = FakeSession(lambda embeds: next(replies, FakeResponse(204)))
+
+    notifier = drain(bot, session, ['a'], tmp_path)
+
+    assert notifier.queue_depth == 0
+    assert session.batches == [['a'], ['a']]
+
+
+def test_unexpected_error_is_retried(bot, tmp_path):
+    calls = []
+
+    def reply(embeds):
+        calls.append(embeds)
+        if len(calls) == 1:
+            raise RuntimeError("fallo raro")
+        return FakeResponse(204)
+
+    notifier = drain(bot, FakeSession(reply), ['a'], tmp_path)
+
+    assert notifier.queue_depth == 0
+    assert calls == [['a'], ['a']]
+
+
+def test_rejected_batch_is_retried_one_by_one(bot, tmp_path):
+    # Discord rechaza cualquier mensaje que contenga el embed 'malo'
+    session = FakeSession(lambda embeds: FakeResponse(400, body={}) if 'malo' in embeds else FakeResponse(204))
+
+    notifier = drain(bot, session, ['a', 'malo', 'b'], tmp_path)
+
+    assert notifier.queue_depth == 0
+    assert session.batches == [['a', 'malo', 'b'], ['a'], ['malo'], ['b']]
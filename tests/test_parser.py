@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURE = os.path.join(ROOT, 'fixtures', 'opgg_profile.html')
+
+
+@pytest.fixture(scope='module')
+def html():
+    with open(FIXTURE, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def test_parses_every_row(bot, html):
+    matches = bot.MatchPageParser().parse(html)
+
+    assert [(m.result, m.champion) for m in matches] == [
+        ('Defeat', 'Yasuo'), ('Defeat', 'Yone'), ('Victory', 'Ahri'),
+        ('Defeat', 'Zed'), ('Victory', 'Lux'), ('Defeat', 'Yasuo'),
+    ]
+    first = matches[0]
+    assert (first.kills, first.deaths, first.assists) == (2, 11, 4)
+    assert first.queue == 'Ranked Solo/Duo'
+    assert first.timestamp == '16/10/2025, 20:10'
+    assert first.played_at.tzinfo is not None
+    assert (first.played_at.hour, first.played_at.minute) == (20, 10)
+
+
+def test_relative_time_is_not_the_duration(bot, html):
+    # La primera fila muestra "hace 5 minutos": no debe confundirse con "27m 41s"
+    first = bot.MatchPageParser().parse(html, limit=1)[0]
+
+    assert first.duration_text == '27m 41s'
+    assert first.duration == 27 * 60 + 41
+
+
+def test_identity_ignores_relative_time(bot, html):
+    parser = bot.MatchPageParser()
+    before = [m.match_id for m in parser.parse(html)]
+    after = [m.match_id for m in parser.parse(html.replace('hace 5 minutos', 'hace 40 minutos'))]
+
+    assert before == after
+    assert len(set(before)) == len(before)
+
+
+def test_limit_and_skip(bot, html):
+    parser = bot.MatchPageParser()
+
+    assert [m.champion for m in parser.parse(html, limit=1)] == ['Yasuo']
+    assert [m.champion for m in parser.parse(html, limit=3, skip=1)] == ['Yone', 'Ahri']
+
+
+def test_limit_stops_tokenizing_early(bot, html, monkeypatch):
+    # Con el historial relleno hasta ~800 KB, limit=1 solo debe leer el primer trozo
+    filler = '<div class="x"><p>relleno</p></div>' * 20000
+    page = html.replace('</body>', filler + '</body>')
+    fed = []
+    original_feed = bot._MatchRowCollector.feed
+    monkeypatch.setattr(bot._MatchRowCollector, 'feed',
+                        lambda self, data: fed.append(len(data)) or original_feed(self, data))
+
+    matches = bot.MatchPageParser().parse(page, limit=1)
+
+    assert [m.champion for m in matches] == ['Yasuo']
+    assert sum(fed) < len(page) // 10
@@ -0,0 +1,32 @@
+import os
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+URL = 'https://www.op.gg/summoners/euw/Foo-EUW'
+
+
+@pytest.fixture
+def matches(bot):
+    with open(os.path.join(ROOT, 'fixtures', 'opgg_profile.html'), 'r', encoding='utf-8') as f:
+        return bot.MatchPageParser().parse(f.read())
+
+
+def test_empty_baseline_is_remembered(bot, matches):
+    # Cuenta nueva: la primera carga no tiene partidas, pero la línea base ya está tomada
+    store = bot.MatchStore(':memory:')
+    assert not store.has_baseline(URL)
+
+    store.add_baseline(URL, [])
+
+    assert store.has_baseline(URL)
+    assert store.unseen(URL, matches[:1]) == matches[:1]
+
+
+def test_history_counts_as_baseline(bot, matches):
+    # Historiales creados antes de la tabla baselines
+    store = bot.MatchStore(':memory:')
+    store.add(URL, matches)
+
+    assert store.has_baseline(URL)
+    assert store.unseen(URL, matches) == []